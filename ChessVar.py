@@ -3,33 +3,196 @@
 # range except for pawns. In Atomic Chess, every capture is suicidal. Even the capturing piece is affected by the
 # explosion and must be taken off the board
 
+import collections
+import random
+import types
+
+ExplosionImpact = collections.namedtuple('ExplosionImpact', ['white_losses', 'black_losses', 'white_king_destroyed',
+                                                             'black_king_destroyed'])
+ExplosionImpact.__doc__ = """What a capture would remove from the board: the (square, piece) pairs each color would
+lose, the capturing and captured pieces included, and whether each king would be destroyed"""
+
+
+def _read_only(table):
+    """Returns a read-only view of a move table, and of the direction dicts it holds for sliding pieces"""
+    return types.MappingProxyType({location: types.MappingProxyType(moves) if isinstance(moves, dict) else moves
+                                   for location, moves in table.items()})
+
+
 class ChessVar:
     """A class to represent a player in the Atomic Chess game, where the color ‘white’ starts first"""
 
+    # Possible moves for each piece from every position on the board. They do not depend on the game, so they are
+    # generated once on first use and shared by every instance as read-only mappings of tuples, which no game can
+    # change for the others.
+    _king_possible_moves = None
+    _bishop_possible_moves = None
+    _knight_possible_moves = None
+    _rook_possible_moves = None
+    _white_pawn_possible_moves = None
+    _black_pawn_possible_moves = None
+    # Squares surrounding every location, which an explosion on that location reaches
+    _blast_squares = None
+    # Random 64-bit keys for every piece of each color on every location, as _zobrist_keys[color][piece][row * 8 +
+    # column], and for black being the side to move, which are combined to hash positions. They come from a fixed
+    # seed so that hashes agree between processes and runs.
+    _zobrist_keys = None
+    _zobrist_black_to_move = None
+    # Profiler installed by enable_profiling, if profiling has ever been enabled
+    _profiler = None
+    # Material value of each piece, in hundredths of a pawn, as tracked for each color while moves are made
+    _piece_values = types.MappingProxyType({'pawn': 100, 'knight': 300, 'bishop': 300, 'rook': 500, 'queen': 900,
+                                            'king': 0})
+    # Function called when a move made with make_move ends the game, as set by set_game_end_callback
+    _game_end_callback = None
+    # Backend generating the moves of the side to move, as chosen with set_move_generation
+    _move_generation = 'lists'
+    # Pieces of the starting position with its hash, king locations and material, worked out by the first game set to
+    # the starting position and copied by the later ones
+    _starting_position = None
+
     def __init__(self):
         """Constructor for the Chess class. Takes no parameters. Initializes the turn, white and black pieces,
         white and black pieces’ locations, and the possible moves for each piece. All data members are private."""
         # Turn starts with white pieces
+        self.reset()
+
+    @staticmethod
+    def _starting_pieces():
+        """Returns the white and black pieces of the starting position, as dicts indexed by their (column, row)
+        location on the board"""
+        white_pieces = {}
+        black_pieces = {}
+        back_row = ['rook', 'knight', 'bishop', 'queen', 'king', 'bishop', 'knight', 'rook']
+        for column in range(8):
+            white_pieces[(column, 0)] = back_row[column]
+            white_pieces[(column, 1)] = 'pawn'
+            black_pieces[(column, 7)] = back_row[column]
+            black_pieces[(column, 6)] = 'pawn'
+        return white_pieces, black_pieces
+
+    def reset(self):
+        """Puts the game back to the starting position with white to move, reusing the game object"""
+        if ChessVar._starting_position is None:
+            self._set_position('white', *self._starting_pieces())
+            ChessVar._starting_position = (dict(self._white_pieces), dict(self._black_pieces), self._hash,
+                                           self._white_king, self._black_king, self._white_material,
+                                           self._black_material)
+            return
+        white_pieces, black_pieces, self._hash, self._white_king, self._black_king, self._white_material, \
+            self._black_material = ChessVar._starting_position
         self._turn = 'white'
-        self._white_pieces = ['rook', 'knight', 'bishop', 'queen', 'king', 'bishop', 'knight', 'rook',
-                              'pawn', 'pawn', 'pawn', 'pawn', 'pawn', 'pawn', 'pawn', 'pawn']
-        # White pieces position
-        self._white_locations = [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0), (5, 0), (6, 0), (7, 0),
-                                 (0, 1), (1, 1), (2, 1), (3, 1), (4, 1), (5, 1), (6, 1), (7, 1)]
-        self._black_pieces = ['rook', 'knight', 'bishop', 'queen', 'king', 'bishop', 'knight', 'rook',
-                              'pawn', 'pawn', 'pawn', 'pawn', 'pawn', 'pawn', 'pawn', 'pawn']
-        # Black pieces position
-        self._black_locations = [(0, 7), (1, 7), (2, 7), (3, 7), (4, 7), (5, 7), (6, 7), (7, 7),
-                                 (0, 6), (1, 6), (2, 6), (3, 6), (4, 6), (5, 6), (6, 6), (7, 6)]
-
+        self._white_pieces = dict(white_pieces)
+        self._black_pieces = dict(black_pieces)
+        self._move_history = []
+        self._state = 'UNFINISHED'
+
+    @classmethod
+    def from_position(cls, white_pieces, black_pieces, turn='white'):
+        """Creates a game from an existing position without going through the starting setup. Takes dicts mapping
+        (column, row) locations to piece names for each color, and the color whose turn it is."""
+        game = cls.__new__(cls)
+        game._set_position(turn, dict(white_pieces), dict(black_pieces))
+        return game
+
+    def get_position(self):
+        """Returns the current position as a (turn, white pieces, black pieces) tuple that can be passed back to
+        from_position. The piece dicts are copies, so changing them does not affect the game."""
+        return self._turn, dict(self._white_pieces), dict(self._black_pieces)
+
+    def to_bytes(self):
+        """Returns the position and side to move encoded in 33 bytes, as described in encoding.py"""
+        # Imported here so that ChessVar.py keeps working on its own
+        from encoding import encode_position
+        return encode_position(self)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Creates a game from the 33-byte encoding returned by to_bytes. Raises ValueError if the data is not exactly
+        33 bytes or holds an invalid piece code"""
+        from encoding import POSITION_SIZE, decode_position
+        if len(data) != POSITION_SIZE:
+            raise ValueError('a position is %d bytes, not %d' % (POSITION_SIZE, len(data)))
+        return decode_position(data)
+
+    def _set_position(self, turn, white_pieces, black_pieces):
+        """Sets the turn and the pieces of both colors, and makes sure the shared move tables are generated"""
         # Initialize all piece possible moves
-        self._king_possible_moves = self._generate_king_possible_moves()
-        self._bishop_possible_moves = self._generate_bishop_possible_moves()
-        self._knight_possible_moves = self._generate_knight_possible_moves()
-        self._rook_possible_moves = self._generate_rook_possible_moves()
-        self._update_pawn_possible_moves()
-
-    def _generate_king_possible_moves(self):
+        if ChessVar._king_possible_moves is None:
+            ChessVar._load_shared_tables()
+        self._turn = turn
+        self._white_pieces = white_pieces
+        self._black_pieces = black_pieces
+        # Moves made on this position, most recent last, as recorded by _play_move
+        self._move_history = []
+        # Hash, king locations (None once a king is gone), material and game state, kept up to date as moves are
+        # made. They are worked out in one pass over the pieces of each color
+        keys = self._zobrist_keys
+        piece_values = self._piece_values
+        position_hash = self._zobrist_black_to_move if turn == 'black' else 0
+        tracked = []
+        for color, pieces in (('white', white_pieces), ('black', black_pieces)):
+            color_keys = keys[color]
+            king = None
+            material = 0
+            for location, piece in pieces.items():
+                position_hash ^= color_keys[piece][location[1] * 8 + location[0]]
+                material += piece_values[piece]
+                if piece == 'king' and king is None:
+                    king = location
+            tracked.append((king, material))
+        self._hash = position_hash
+        (self._white_king, self._white_material), (self._black_king, self._black_material) = tracked
+        self._state = self._compute_game_state()
+
+    @classmethod
+    def _load_shared_tables(cls):
+        """Generates the possible moves of every piece and the hash keys, and stores them on the class, where all
+        games share them"""
+        zobrist_keys, cls._zobrist_black_to_move = cls._generate_zobrist_keys()
+        cls._zobrist_keys = _read_only(zobrist_keys)
+        cls._king_possible_moves = _read_only(cls._generate_king_possible_moves())
+        cls._bishop_possible_moves = _read_only(cls._generate_bishop_possible_moves())
+        cls._knight_possible_moves = _read_only(cls._generate_knight_possible_moves())
+        cls._rook_possible_moves = _read_only(cls._generate_rook_possible_moves())
+        cls._update_pawn_possible_moves()
+        cls._blast_squares = _read_only(cls._generate_blast_squares())
+
+    @staticmethod
+    def _generate_zobrist_keys():
+        """Generate a random 64-bit key for every piece of each color on each position of the board, as a tuple per
+        color and piece indexed by row * 8 + column, and one for black being the side to move"""
+        generator = random.Random(0x5EED)
+        keys = {}
+        for color in ('white', 'black'):
+            keys[color] = {}
+            for piece in ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king'):
+                piece_keys = [0] * 64
+                for column in range(8):
+                    for row in range(8):
+                        piece_keys[row * 8 + column] = generator.getrandbits(64)
+                keys[color][piece] = tuple(piece_keys)
+        return keys, generator.getrandbits(64)
+
+    def _compute_position_hash(self):
+        """Computes the Zobrist hash of the position from scratch by combining the keys of every piece on the board
+        and of the side to move"""
+        white_keys = self._zobrist_keys['white']
+        black_keys = self._zobrist_keys['black']
+        position_hash = self._zobrist_black_to_move if self._turn == 'black' else 0
+        for (column, row), piece in self._white_pieces.items():
+            position_hash ^= white_keys[piece][row * 8 + column]
+        for (column, row), piece in self._black_pieces.items():
+            position_hash ^= black_keys[piece][row * 8 + column]
+        return position_hash
+
+    def get_position_hash(self):
+        """Returns the 64-bit Zobrist hash of the position, including the side to move. Equal positions have equal
+        hashes, whatever moves led to them. The hash is kept up to date as moves are made, so this is O(1)"""
+        return self._hash
+
+    @staticmethod
+    def _generate_king_possible_moves():
         """Generate all possible moves for a king from each position on the board"""
         possible_moves = {}
         for row in range(8):
@@ -43,10 +206,11 @@ class ChessVar:
                         new_row, new_col = row + dr, col + dc
                         if 0 <= new_row < 8 and 0 <= new_col < 8:
                             moves.append((new_row, new_col))
-                possible_moves[(row, col)] = moves
+                possible_moves[(row, col)] = tuple(moves)
         return possible_moves
 
-    def _generate_bishop_possible_moves(self):
+    @staticmethod
+    def _generate_bishop_possible_moves():
         """Generate all possible moves for a bishop from each position on the board"""
         directions = {
             'ne': (1, 1),
@@ -68,10 +232,11 @@ class ChessVar:
                             moves[direction].append((r, c))
                         else:
                             break
-                possible_moves[(row, col)] = moves
+                possible_moves[(row, col)] = {direction: tuple(squares) for direction, squares in moves.items()}
         return possible_moves
 
-    def _generate_knight_possible_moves(self):
+    @staticmethod
+    def _generate_knight_possible_moves():
         """Generate all possible moves for a knight from each position on the board"""
         knight_moves = [
             (2, 1), (1, 2), (-1, 2), (-2, 1),
@@ -86,10 +251,11 @@ class ChessVar:
                     new_row, new_col = row + dr, col + dc
                     if 0 <= new_row < 8 and 0 <= new_col < 8:
                         moves.append((new_row, new_col))
-                possible_moves[(row, col)] = moves
+                possible_moves[(row, col)] = tuple(moves)
         return possible_moves
 
-    def _generate_rook_possible_moves(self):
+    @staticmethod
+    def _generate_rook_possible_moves():
         """Generate all possible moves for a rook from each position on the board"""
         directions = {
             'up': (0, 1),
@@ -111,20 +277,17 @@ class ChessVar:
                             moves[direction].append((r, c))
                         else:
                             break
-                possible_moves[(row, col)] = moves
+                possible_moves[(row, col)] = {direction: tuple(squares) for direction, squares in moves.items()}
         return possible_moves
 
-    def _update_pawn_possible_moves(self):
-        """Update possible moves for pawns (implementation not shown)"""
-        pass
-
-
-    def _update_pawn_possible_moves(self):
+    @classmethod
+    def _update_pawn_possible_moves(cls):
         """Generate possible moves for white and black pawns from each position on the board"""
-        self._white_pawn_possible_moves = self._generate_pawn_possible_moves('white')
-        self._black_pawn_possible_moves = self._generate_pawn_possible_moves('black')
+        cls._white_pawn_possible_moves = _read_only(cls._generate_pawn_possible_moves('white'))
+        cls._black_pawn_possible_moves = _read_only(cls._generate_pawn_possible_moves('black'))
 
-    def _generate_pawn_possible_moves(self, color):
+    @staticmethod
+    def _generate_pawn_possible_moves(color):
         """Generate all possible moves for pawns of the given color"""
         pawn_moves = {}
         direction = 1 if color == 'white' else -1
@@ -138,14 +301,21 @@ class ChessVar:
                     # Move two squares forward from the starting row
                     if row == (1 if color == 'white' else 6) and 0 <= row + 2 * direction < 8:
                         moves.append((row + 2 * direction, col))
-                pawn_moves[(row, col)] = moves
+                pawn_moves[(row, col)] = tuple(moves)
         return pawn_moves
 
     def get_game_state(self):
-        """Returns the current state of the game, which could be 'Unfinished', ‘White won’, or ‘Black won’"""
-        if 'king' in self._white_pieces and 'king' not in self._black_pieces:
+        """Returns the current state of the game, which could be 'Unfinished', ‘White won’, or ‘Black won’. The state is
+        kept up to date as moves are made, so this is O(1)"""
+        return self._state
+
+    def _compute_game_state(self):
+        """Works out the state of the game from the tracked king locations"""
+        white_has_king = self._white_king is not None
+        black_has_king = self._black_king is not None
+        if white_has_king and not black_has_king:
             state = 'WHITE_WON'
-        elif 'king' in self._black_pieces and 'king' not in self._white_pieces:
+        elif black_has_king and not white_has_king:
             state = 'BLACK_WON'
         else:
             state = 'UNFINISHED'
@@ -159,154 +329,336 @@ class ChessVar:
         row = int(square_moved[1]) - 1
         return (column, row)
 
+    def convert_location_to_square(self, location):
+        """Converts a (column, row) coordinate on the chessboard to its square notation ('a1', 'e4', etc.). It is the
+        inverse of convert_square_to_location"""
+        return chr(ord('a') + location[0]) + str(location[1] + 1)
+
     def make_move(self, square_moved_from, square_moved_to):
         """Translates the square notations into coordinates, identifies the piece being moved, verifies the move's
         validity, updates the board if the move is valid, and handles explosions if applicable"""
-        if self.get_game_state() == 'BLACK_WON' or self.get_game_state() == 'WHITE_WON':
+        if self.get_game_state() != 'UNFINISHED':
             return False
         # Converts square notations to coordinates
         from_location = self.convert_square_to_location(square_moved_from)
         to_location = self.convert_square_to_location(square_moved_to)
-        # Determine piece being moved based on current turn
+        if not self._is_legal_location_move(from_location, to_location):
+            return False
+        # An unfinished game has either both kings or, after a capture that destroyed both, neither
+        kings_were_on_board = self._white_king is not None
+        self._play_move(from_location, to_location)
+        both_kings_destroyed = self._white_king is None and self._black_king is None
+        if self._game_end_callback is not None and kings_were_on_board and \
+                (self._state != 'UNFINISHED' or both_kings_destroyed):
+            self._game_end_callback(self, self._state)
+        # Checks for game end condition
+        if both_kings_destroyed:
+            return False
+        return True
+
+    def set_game_end_callback(self, callback):
+        """Sets a function to be called as callback(game, state) when a move made with make_move ends the game, with
+        the state get_game_state then returns. A capture that destroys both kings also ends the game, although the
+        state stays 'UNFINISHED'. Moves played by searches are not reported. Pass None to remove the callback"""
+        self._game_end_callback = callback
+
+    def get_king_location(self, color):
+        """Returns the (column, row) location of the king of the given color, or None if it has been destroyed"""
+        return self._white_king if color == 'white' else self._black_king
+
+    def get_material(self, color):
+        """Returns the total value of the pieces of the given color, in hundredths of a pawn"""
+        return self._white_material if color == 'white' else self._black_material
+
+    def _play_move(self, from_location, to_location):
+        """Moves the piece of the side to move from one location to another, handling captures and explosions, and
+        switches the turn. The move must be legal. Records what changed on the move history so that undo_move can
+        revert it"""
+        if self._turn == 'white':
+            ally_pieces = self._white_pieces
+            opponent_pieces = self._black_pieces
+        else:
+            ally_pieces = self._black_pieces
+            opponent_pieces = self._white_pieces
+        keys = self._zobrist_keys
+        previous_hash = self._hash
+        from_piece = ally_pieces.pop(from_location)
+        piece_keys = keys[self._turn][from_piece]
+        self._hash ^= piece_keys[from_location[1] * 8 + from_location[0]]
+        # To check if the destination location contains an opponent piece
+        captured_piece = opponent_pieces.pop(to_location, None)
+        if captured_piece is not None:
+            opponent_color = 'black' if self._turn == 'white' else 'white'
+            self._hash ^= keys[opponent_color][captured_piece][to_location[1] * 8 + to_location[0]]
+            self._untrack_piece(self._turn, from_piece)
+            self._untrack_piece(opponent_color, captured_piece)
+            # Handles explosion, the capturing piece having been removed from the board
+            exploded_pieces = self.explosion_handler(to_location)
+            # Only captures and explosions remove kings
+            self._state = self._compute_game_state()
+        else:
+            # Updates the piece's location
+            ally_pieces[to_location] = from_piece
+            self._hash ^= piece_keys[to_location[1] * 8 + to_location[0]]
+            if from_piece == 'king':
+                self._track_king(self._turn, to_location)
+            exploded_pieces = ()
+        self._move_history.append((from_location, to_location, from_piece, captured_piece, exploded_pieces,
+                                   previous_hash))
+        # Switches turn
+        self._turn = 'black' if self._turn == 'white' else 'white'
+        self._hash ^= self._zobrist_black_to_move
+
+    def undo_move(self):
+        """Reverts the last move made on the game, restoring the moved, captured and exploded pieces and the turn.
+        Returns True if a move was reverted and False if there are no moves to revert"""
+        if not self._move_history:
+            return False
+        from_location, to_location, from_piece, captured_piece, exploded_pieces, previous_hash = \
+            self._move_history.pop()
+        self._hash = previous_hash
+        # Switches turn back to the player who made the move
+        self._turn = 'black' if self._turn == 'white' else 'white'
+        if self._turn == 'white':
+            ally_pieces = self._white_pieces
+            opponent_pieces = self._black_pieces
+        else:
+            ally_pieces = self._black_pieces
+            opponent_pieces = self._white_pieces
+        if captured_piece is None:
+            del ally_pieces[to_location]
+            if from_piece == 'king':
+                self._track_king(self._turn, from_location)
+        else:
+            # Puts back every piece removed by the explosion, then the captured piece
+            for color, location, piece in exploded_pieces:
+                if color == 'white':
+                    self._white_pieces[location] = piece
+                else:
+                    self._black_pieces[location] = piece
+                self._track_piece(color, location, piece)
+            opponent_pieces[to_location] = captured_piece
+            self._track_piece('black' if self._turn == 'white' else 'white', to_location, captured_piece)
+            self._track_piece(self._turn, from_location, from_piece)
+            self._state = self._compute_game_state()
+        ally_pieces[from_location] = from_piece
+        return True
+
+    def _track_king(self, color, location):
+        """Records the new location of a king, or None once it is gone"""
+        if color == 'white':
+            self._white_king = location
+        else:
+            self._black_king = location
+
+    def _track_piece(self, color, location, piece):
+        """Adds a piece put back on the board to the tracked material and king locations"""
+        if color == 'white':
+            self._white_material += self._piece_values[piece]
+        else:
+            self._black_material += self._piece_values[piece]
+        if piece == 'king':
+            self._track_king(color, location)
+
+    def _untrack_piece(self, color, piece):
+        """Takes a piece removed from the board out of the tracked material and king locations"""
+        if color == 'white':
+            self._white_material -= self._piece_values[piece]
+        else:
+            self._black_material -= self._piece_values[piece]
+        if piece == 'king':
+            self._track_king(color, None)
+
+    def generate_moves(self):
+        """Yields every legal move for the side to move as a (square moved from, square moved to) pair in square
+        notation, such as ('e2', 'e4'). These are exactly the moves make_move would accept. As a generator, callers
+        can stop as soon as they have found the move they need"""
+        for from_location, to_location in self._generate_location_moves():
+            yield self.convert_location_to_square(from_location), self.convert_location_to_square(to_location)
+
+    def _generate_list_moves(self):
+        """Yields every legal move for the side to move as a pair of (column, row) coordinates, found with the
+        per-piece get_*_possible_moves methods"""
+        if self.get_game_state() != 'UNFINISHED':
+            return
         if self._turn == 'white':
-            if from_location not in self._white_locations:
-                return False
-            from_selection = self._white_locations.index(from_location)
-            from_piece = self._white_pieces[from_selection]
+            ally_pieces = self._white_pieces
+            opponent_pieces = self._black_pieces
         else:
-            if from_location not in self._black_locations:
-                return False
-            from_selection = self._black_locations.index(from_location)
-            from_piece = self._black_pieces[from_selection]
-        # Initializing variable
-        to_piece = None
-
-        if from_piece == 'pawn':
+            ally_pieces = self._black_pieces
+            opponent_pieces = self._white_pieces
+        # The pieces are copied so that callers may make moves while iterating
+        for from_location, from_piece in list(ally_pieces.items()):
+            for to_location in self._get_piece_possible_moves(from_piece, from_location, self._turn):
+                # Kings cannot capture
+                if from_piece == 'king' and to_location in opponent_pieces:
+                    continue
+                yield from_location, to_location
+
+    # Generates every legal move for the side to move as pairs of (column, row) coordinates, with the backend chosen
+    # by set_move_generation
+    _generate_location_moves = _generate_list_moves
+
+    def is_legal(self, square_moved_from, square_moved_to):
+        """Returns True if make_move would accept the move from one square notation to the other, without changing
+        the game"""
+        if self.get_game_state() != 'UNFINISHED':
+            return False
+        return self._is_legal_location_move(self.convert_square_to_location(square_moved_from),
+                                            self.convert_square_to_location(square_moved_to))
+
+    def _is_legal_location_move(self, from_location, to_location):
+        """Returns True if the side to move has a piece on from_location that can move to to_location. Does not check
+        whether the game has already been won"""
+        # Determine pieces of the side to move and of the opponent based on current turn
+        if self._turn == 'white':
+            ally_pieces = self._white_pieces
+            opponent_pieces = self._black_pieces
+        else:
+            ally_pieces = self._black_pieces
+            opponent_pieces = self._white_pieces
+        # Determine piece being moved
+        from_piece = ally_pieces.get(from_location)
+        if from_piece is None:
+            return False
+        # Checks if the piece being moved is the king capturing an opponent piece
+        if from_piece == 'king' and to_location in opponent_pieces:
+            return False
+        return to_location in self._get_piece_possible_moves(from_piece, from_location, self._turn)
+
+    def book_move(self, book):
+        """Looks the current position up in a position book (see book.py) and returns its BookEntry, or None if the
+        position is not in the book or the book move is not legal here"""
+        entry = book.lookup(self._hash)
+        if entry is None or not self.is_legal(*entry.move):
+            return None
+        return entry
+
+    def best_move(self, depth=4, time_limit=None, searcher=None, workers=None, book=None, executor=None):
+        """Searches for the best move of the side to move with iterative-deepening alpha-beta, up to the given depth
+        or until time_limit seconds have passed, and returns a SearchResult holding the move in square notation, its
+        score, the depth reached and the nodes per second. The game is left unchanged. Passing the same searcher for
+        successive moves reuses its transposition table. With more than one worker, the root moves are split over
+        that many processes, run by the given ProcessPoolExecutor or else by the pool parallel_search.py keeps for
+        later searches (see parallel_search.shutdown_search_workers), which is started again if one of its processes
+        has died. If a position book is given and holds the position, its move is returned without searching, scored
+        by the static evaluation of the position it leads to. The book's own score, which counts games rather than
+        hundredths of a pawn, is available from book_move"""
+        # Imported here so that ChessVar.py keeps working on its own
+        from search import Searcher, SearchResult, evaluate
+        if book is not None:
+            entry = self.book_move(book)
+            if entry is not None:
+                self._play_move(self.convert_square_to_location(entry.move[0]),
+                                self.convert_square_to_location(entry.move[1]))
+                score = -evaluate(self)
+                self.undo_move()
+                return SearchResult(entry.move, score, 0, 1, 0.0)
+        if workers is not None and workers > 1:
+            from parallel_search import get_search_executor, parallel_best_move, shutdown_search_workers
+            if executor is not None:
+                return parallel_best_move(self, depth, time_limit, workers, executor)
+            from concurrent.futures.process import BrokenProcessPool
+            try:
+                return parallel_best_move(self, depth, time_limit, workers, get_search_executor(workers))
+            except BrokenProcessPool:
+                # A worker process died, which breaks the whole kept pool, so it is replaced and the search run again
+                shutdown_search_workers()
+                return parallel_best_move(self, depth, time_limit, workers, get_search_executor(workers))
+        if searcher is None:
+            searcher = Searcher()
+        return searcher.search(self, depth, time_limit)
+
+    @classmethod
+    def set_move_generation(cls, backend):
+        """Chooses how every game generates the moves of the side to move for generate_moves, searches and perft:
+        'lists', with the per-piece get_*_possible_moves methods, or 'bitboard', with the cached bitboard generation
+        of bitboard.py, which is faster and gives the same moves in another order. make_move and is_legal are the
+        same with either backend. Switching back to 'lists' frees the caches of the bitboard backend. Raises
+        ValueError for another backend"""
+        if backend == 'lists':
+            cls._generate_location_moves = ChessVar._generate_list_moves
+            if cls._move_generation == 'bitboard':
+                # Imported here so that ChessVar.py keeps working on its own
+                from bitboard import clear_caches
+                clear_caches()
+        elif backend == 'bitboard':
+            # Imported here so that ChessVar.py keeps working on its own
+            from bitboard import generate_location_moves
+            cls._generate_location_moves = generate_location_moves
+        else:
+            raise ValueError('unknown move generation backend %r' % backend)
+        cls._move_generation = backend
+
+    @classmethod
+    def enable_profiling(cls):
+        """Starts counting the calls to make_move, get_game_state, explosion_handler and the get_*_possible_moves
+        methods of every game, and timing them. Returns the Profiler (see profiling.py) holding the counters, which
+        as_dict and to_prometheus export. The counters carry on from earlier profiling until reset"""
+        # Imported here so that ChessVar.py keeps working on its own
+        from profiling import Profiler
+        if cls._profiler is None:
+            cls._profiler = Profiler()
+        cls._profiler.enable(cls)
+        return cls._profiler
+
+    @classmethod
+    def disable_profiling(cls):
+        """Stops profiling, putting back the uninstrumented methods, and returns the Profiler, or None if profiling
+        was never enabled"""
+        if cls._profiler is not None:
+            cls._profiler.disable()
+        return cls._profiler
+
+    def _get_piece_possible_moves(self, piece, position, color):
+        """Returns the possible moves of the given piece at a given position, using the method for that piece type"""
+        if piece == 'pawn':
             # Gets possible moves for a pawn piece
-            moves_list = self.get_pawn_possible_moves(from_location, self._turn)
-        elif from_piece == 'rook':
+            return self.get_pawn_possible_moves(position, color)
+        elif piece == 'rook':
             # Gets possible moves for a rook piece
-            moves_list = self.get_rook_possible_moves(from_location, self._turn)
-        elif from_piece == 'knight':
+            return self.get_rook_possible_moves(position, color)
+        elif piece == 'knight':
             # Gets possible moves for a knight piece
-            moves_list = self.get_knight_possible_moves(from_location, self._turn)
-        elif from_piece == 'bishop':
+            return self.get_knight_possible_moves(position, color)
+        elif piece == 'bishop':
             # Gets possible moves for a bishop piece
-            moves_list = self.get_bishop_possible_moves(from_location, self._turn)
-        elif from_piece == 'queen':
+            return self.get_bishop_possible_moves(position, color)
+        elif piece == 'queen':
             # Gets possible moves for a queen piece
-            moves_list = self.get_queen_possible_moves(from_location, self._turn)
-        elif from_piece == 'king':
+            return self.get_queen_possible_moves(position, color)
+        elif piece == 'king':
             # Gets possible moves for a king piece
-            moves_list = self.get_king_possible_moves(from_location, self._turn)
-
-        if to_location in moves_list:
-            if self._turn == 'white':
-                # To check if the destination location contains a black piece
-                if to_location in self._black_locations:
-                    # Checks if piece being moved is the king
-                    if from_piece == "king":
-                        return False
-                    # Remove pieces from their lists
-                    to_selection = self._black_locations.index(to_location)
-                    self._white_locations.pop(from_selection)
-                    self._white_pieces.pop(from_selection)
-                    self._black_locations.pop(to_selection)
-                    self._black_pieces.pop(to_selection)
-                    # Handles explosion
-                    self.explosion_handler(to_location)
-                else:
-                    # Updates white piece's location
-                    self._white_locations[from_selection] = to_location
-                # Switches turn to black
-                self._turn = 'black'
-            else:
-                # To check if the destination location contains a white piece
-                if to_location in self._white_locations:
-                    # Checks if the piece being moved is the king
-                    if from_piece == "king":
-                        return False
-                    # Remove pieces from their lists
-                    to_selection = self._white_locations.index(to_location)
-                    self._black_locations.pop(from_selection)
-                    self._black_pieces.pop(from_selection)
-                    self._white_locations.pop(to_selection)
-                    self._white_pieces.pop(to_selection)
-                    # Handles explosion
-                    self.explosion_handler(to_location)
-                else:
-                    # Updates black piece's location
-                    self._black_locations[from_selection] = to_location
-                # Switches turn to white
-                self._turn = 'white'
-            # Checks for game end condition
-            if 'king' not in self._white_pieces and 'king' not in self._black_pieces:
-                return False
-            return True
-        else:
-            return False
+            return self.get_king_possible_moves(position, color)
 
     def get_bishop_possible_moves(self, position, color):
         """Calculates and returns the possible moves for a bishop piece at a given position on the chessboard.
         It iterates over all possible diagonal directions ('se', 'sw', 'ne', 'nw'), determining valid moves until same
         colored pieces are encountered."""
         # Gets possible moves for the bishop from the given position
-        moves_list_for_position = self._bishop_possible_moves.get(position)
+        moves_list_for_position = self._bishop_possible_moves[position]
 
-        # Defines lists of opponent and ally pieces based on the bishop's color
+        # Defines opponent and ally pieces based on the bishop's color
         if color == 'white':
-            opponent_list = self._black_locations
-            ally_list = self._white_locations
+            opponent_pieces = self._black_pieces
+            ally_pieces = self._white_pieces
         else:
-            ally_list = self._black_locations
-            opponent_list = self._white_locations
+            ally_pieces = self._black_pieces
+            opponent_pieces = self._white_pieces
 
         result_moves_list = []
 
-        # Iterates over possible diagonal directions
-        # South East
-        for bishop_position in moves_list_for_position.get('se'):
-            # Checks if the position is not occupied by opponent or ally pieces
-            if bishop_position not in ally_list and bishop_position not in opponent_list:
-                result_moves_list.append(bishop_position)
-            else:
-                # Valid move if the position is occupied by an opponent piece
-                if bishop_position in opponent_list:
-                    result_moves_list.append(bishop_position)
-                break
-
-        # South West
-        for bishop_position in moves_list_for_position.get('sw'):
-            # Checks if the position is not occupied by opponent or ally pieces
-            if bishop_position not in ally_list and bishop_position not in opponent_list:
-                result_moves_list.append(bishop_position)
-            else:
-                # Valid move if the position is occupied by an opponent piece
-                if bishop_position in opponent_list:
+        # Iterates over possible diagonal directions: South East, South West, North East and North West
+        for direction in ('se', 'sw', 'ne', 'nw'):
+            for bishop_position in moves_list_for_position[direction]:
+                # Checks if the position is not occupied by opponent or ally pieces
+                if bishop_position not in ally_pieces and bishop_position not in opponent_pieces:
                     result_moves_list.append(bishop_position)
-                break
-
-        # North East
-        for bishop_position in moves_list_for_position.get('ne'):
-            # Checks if the position is not occupied by opponent or ally pieces
-            if bishop_position not in ally_list and bishop_position not in opponent_list:
-                result_moves_list.append(bishop_position)
-            else:
-                if bishop_position in opponent_list:
-                    # Valid move if the position is occupied by an opponent piece
-                    result_moves_list.append(bishop_position)
-                break
-
-        # North West
-        for bishop_position in moves_list_for_position.get('nw'):
-            # Checks if the position is not occupied by opponent or ally pieces
-            if bishop_position not in ally_list and bishop_position not in opponent_list:
-                result_moves_list.append(bishop_position)
-            else:
-                if bishop_position in opponent_list:
+                else:
                     # Valid move if the position is occupied by an opponent piece
-                    result_moves_list.append(bishop_position)
-                break
+                    if bishop_position in opponent_pieces:
+                        result_moves_list.append(bishop_position)
+                    break
         return result_moves_list
 
     def get_rook_possible_moves(self, position, color):
@@ -315,62 +667,29 @@ class ChessVar:
         of tuples that represent the moves"""
 
         # Get possible moves for the rook from the given position
-        moves_list_for_position = self._rook_possible_moves.get(position)
+        moves_list_for_position = self._rook_possible_moves[position]
 
-        # Defines lists of opponent and ally pieces based on the rook's color
+        # Defines opponent and ally pieces based on the rook's color
         if color == 'white':
-            opponent_list = self._black_locations
-            ally_list = self._white_locations
+            opponent_pieces = self._black_pieces
+            ally_pieces = self._white_pieces
         else:
-            ally_list = self._black_locations
-            opponent_list = self._white_locations
+            ally_pieces = self._black_pieces
+            opponent_pieces = self._white_pieces
 
         result_moves_list = []
 
-        # Iterate over possible directions
-        # UP
-        for rook_position in moves_list_for_position.get('up'):
-            # Checks if the position is not occupied by ally or opponent pieces
-            if rook_position not in ally_list and rook_position not in opponent_list:
-                result_moves_list.append(rook_position)
-            else:
-                # Valid move if the position is occupied by an opponent piece
-                if rook_position in opponent_list:
+        # Iterate over possible directions: UP, DOWN, LEFT and RIGHT
+        for direction in ('up', 'down', 'left', 'right'):
+            for rook_position in moves_list_for_position[direction]:
+                # Checks if the position is not occupied by ally or opponent pieces
+                if rook_position not in ally_pieces and rook_position not in opponent_pieces:
                     result_moves_list.append(rook_position)
-                break
-
-        # DOWN
-        for rook_position in moves_list_for_position.get('down'):
-            # Checks if the position is not occupied by ally or opponent pieces
-            if rook_position not in ally_list and rook_position not in opponent_list:
-                result_moves_list.append(rook_position)
-            else:
-                # Valid move if the position is occupied by an opponent piece
-                if rook_position in opponent_list:
-                    result_moves_list.append(rook_position)
-                break
-
-        # LEFT
-        for rook_position in moves_list_for_position.get('left'):
-            # Checks if the position is not occupied by ally or opponent pieces
-            if rook_position not in ally_list and rook_position not in opponent_list:
-                result_moves_list.append(rook_position)
-            else:
-                # Valid move if the position is occupied by an opponent piece
-                if rook_position in opponent_list:
-                    result_moves_list.append(rook_position)
-                break
-
-        # RIGHT
-        for rook_position in moves_list_for_position.get('right'):
-            # Checks if the position is not occupied by ally or opponent pieces
-            if rook_position not in ally_list and rook_position not in opponent_list:
-                result_moves_list.append(rook_position)
-            else:
-                # Valid move if the position is occupied by an opponent piece
-                if rook_position in opponent_list:
-                    result_moves_list.append(rook_position)
-                break
+                else:
+                    # Valid move if the position is occupied by an opponent piece
+                    if rook_position in opponent_pieces:
+                        result_moves_list.append(rook_position)
+                    break
         return result_moves_list
 
     def get_knight_possible_moves(self, position, color):
@@ -378,21 +697,19 @@ class ChessVar:
          list of tuples that represent the moves"""
 
         # Gets possible moves for the knight from the given position
-        moves_list_for_position = self._knight_possible_moves.get(position)
+        moves_list_for_position = self._knight_possible_moves[position]
 
-        # Defines lists of opponent and ally pieces based on the knight's color
+        # Defines ally pieces based on the knight's color
         if color == 'white':
-            opponent_list = self._black_locations
-            ally_list = self._white_locations
+            ally_pieces = self._white_pieces
         else:
-            ally_list = self._black_locations
-            opponent_list = self._white_locations
+            ally_pieces = self._black_pieces
 
         result_moves_list = []
 
         for knight_position in moves_list_for_position:
             # Check if the position is not occupied by an ally piece
-            if knight_position not in ally_list:
+            if knight_position not in ally_pieces:
                 result_moves_list.append(knight_position)
         return result_moves_list
 
@@ -402,30 +719,26 @@ class ChessVar:
 
         # Gets possible moves for the queen by combining moves of a bishop and a rook
         moves_list = self.get_bishop_possible_moves(position, color)
-        second_list = self.get_rook_possible_moves(position, color)
-        for i in range(len(second_list)):
-            moves_list.append(second_list[i])
+        moves_list.extend(self.get_rook_possible_moves(position, color))
         return moves_list
 
     def get_king_possible_moves(self, position, color):
         """Calculates and returns the possible moves for a king piece at a given position on the chessboard."""
 
         # Gets possible moves for the king from the given position
-        moves_list_for_position = self._king_possible_moves.get(position)
+        moves_list_for_position = self._king_possible_moves[position]
 
-        # Defines lists of opponent and ally pieces based on the king's color
+        # Defines ally pieces based on the king's color
         if color == 'white':
-            opponent_list = self._black_locations
-            ally_list = self._white_locations
+            ally_pieces = self._white_pieces
         else:
-            ally_list = self._black_locations
-            opponent_list = self._white_locations
+            ally_pieces = self._black_pieces
 
         result_moves_list = []
 
         for king_position in moves_list_for_position:
             # Checks if the position is not occupied by an ally piece
-            if king_position not in ally_list:
+            if king_position not in ally_pieces:
                 result_moves_list.append(king_position)
         return result_moves_list
 
@@ -434,84 +747,138 @@ class ChessVar:
         It checks for valid pawn moves, including forward moves, captures, and double moves on
         the initial pawn placement. Returns a list of tuples that represent the moves"""
         result_moves_list = []
+        column, row = position
         if color == 'white':
-            moves_list_for_position = self._white_pawn_possible_moves.get(position)
-            opponent_list = self._black_locations
-            ally_list = self._white_locations
-
-            # Checks for double move on initial pawn placement and forward moves
-            if (position[0], position[1] + 2) not in self._white_locations and \
-                    (position[0], position[1] + 1) not in self._white_locations and \
-                    (position[0], position[1] + 1) not in self._black_locations and \
-                    (position[0], position[1] + 2) not in self._black_locations and position[1] == 1:
-                result_moves_list.append((position[0], position[1] + 2))
-            # Checks for captures
-            if (position[0] + 1, position[1] + 1) in self._black_locations:
-                result_moves_list.append((position[0] + 1, position[1] + 1))
-            if (position[0] - 1, position[1] + 1) in self._black_locations:
-                result_moves_list.append((position[0] - 1, position[1] + 1))
+            moves_list_for_position = self._white_pawn_possible_moves[position]
+            opponent_pieces = self._black_pieces
+            ally_pieces = self._white_pieces
+            direction, start_row = 1, 1
         else:
-            moves_list_for_position = self._black_pawn_possible_moves.get(position)
-            ally_list = self._black_locations
-            opponent_list = self._white_locations
-            # Checks for double move on initial pawn placement and forward moves
-            if (position[0], position[1] - 2) not in self._white_locations and \
-                    (position[0], position[1] - 1) not in self._white_locations and \
-                    (position[0], position[1] - 1) not in self._black_locations and \
-                    (position[0], position[1] - 2) not in self._black_locations and position[1] == 6:
-                result_moves_list.append((position[0], position[1] - 2))
-            # Checks for captures
-            if (position[0] + 1, position[1] - 1) in self._white_locations:
-                result_moves_list.append((position[0] + 1, position[1] - 1))
-            if (position[0] - 1, position[1] - 1) in self._white_locations:
-                result_moves_list.append((position[0] - 1, position[1] - 1))
+            moves_list_for_position = self._black_pawn_possible_moves[position]
+            ally_pieces = self._black_pieces
+            opponent_pieces = self._white_pieces
+            direction, start_row = -1, 6
+
+        # Checks for double move on initial pawn placement and forward moves
+        one_step = (column, row + direction)
+        two_steps = (column, row + 2 * direction)
+        if row == start_row and \
+                one_step not in ally_pieces and one_step not in opponent_pieces and \
+                two_steps not in ally_pieces and two_steps not in opponent_pieces:
+            result_moves_list.append(two_steps)
+        # Checks for captures
+        if (column + 1, row + direction) in opponent_pieces:
+            result_moves_list.append((column + 1, row + direction))
+        if (column - 1, row + direction) in opponent_pieces:
+            result_moves_list.append((column - 1, row + direction))
 
         for pawn_position in moves_list_for_position:
             # Checks if the position is not occupied by ally or opponent pieces
-            if pawn_position not in ally_list and pawn_position not in opponent_list:
+            if pawn_position not in ally_pieces and pawn_position not in opponent_pieces:
                 result_moves_list.append(pawn_position)
         return result_moves_list
 
+    def explosion_impact(self, square_moved_from, square_moved_to):
+        """Returns an ExplosionImpact describing what the side to move would lose and destroy by capturing from one
+        square notation to the other, without changing the game. Returns None if the move is not a capture of an
+        opponent piece by a piece of the side to move. Whether the piece can actually reach the square is not
+        checked, so that candidate captures can be scored before is_legal is called"""
+        removed_pieces = self._explosion_impact(self.convert_square_to_location(square_moved_from),
+                                                self.convert_square_to_location(square_moved_to))
+        if removed_pieces is None:
+            return None
+        losses = {'white': [], 'black': []}
+        for color, location, piece in removed_pieces:
+            losses[color].append((self.convert_location_to_square(location), piece))
+        return ExplosionImpact(tuple(losses['white']), tuple(losses['black']),
+                               any(piece == 'king' for _, piece in losses['white']),
+                               any(piece == 'king' for _, piece in losses['black']))
+
+    def _explosion_impact(self, from_location, to_location):
+        """Returns the pieces a capture between two (column, row) locations would remove, as a list of (color,
+        location, piece) tuples starting with the capturing and the captured piece, or None if the move is not a
+        capture by the side to move"""
+        if self._turn == 'white':
+            ally_color, opponent_color = 'white', 'black'
+            ally_pieces = self._white_pieces
+            opponent_pieces = self._black_pieces
+        else:
+            ally_color, opponent_color = 'black', 'white'
+            ally_pieces = self._black_pieces
+            opponent_pieces = self._white_pieces
+        from_piece = ally_pieces.get(from_location)
+        captured_piece = opponent_pieces.get(to_location)
+        if from_piece is None or captured_piece is None:
+            return None
+        removed_pieces = [(ally_color, from_location, from_piece), (opponent_color, to_location, captured_piece)]
+        for location in self._blast_squares[to_location]:
+            piece = opponent_pieces.get(location)
+            if piece is not None:
+                if piece != 'pawn':
+                    removed_pieces.append((opponent_color, location, piece))
+                continue
+            piece = ally_pieces.get(location)
+            # The capturing piece has already left its square when the explosion happens
+            if piece is not None and piece != 'pawn' and location != from_location:
+                removed_pieces.append((ally_color, location, piece))
+        return removed_pieces
+
     def explosion_handler(self, location):
-        """Handles the explosion event caused by a piece. Removes surrounding pieces based on the explosion."""
+        """Handles the explosion event caused by a piece. Removes surrounding pieces based on the explosion and returns
+        them as a list of (color, location, piece) tuples."""
 
         # Gets surrounding squares affected by the explosion
-        explosive_squares = self.get_surrounding_squares(location)
+        explosive_squares = self._blast_squares[location]
+
+        # Pieces removed by the explosion, as (color, location, piece) tuples
+        exploded_pieces = []
 
         # Iterates over explosive squares
         for piece_coordinates in explosive_squares:
-            # Checks if the square contains a white piece
-            if piece_coordinates in self._white_locations:
-                selection = self._white_locations.index(piece_coordinates)
-                # Checks if the piece is not a pawn
-                if self._white_pieces[selection] != 'pawn':
+            # Checks if the square contains a white piece that is not a pawn
+            piece = self._white_pieces.get(piece_coordinates)
+            if piece is not None:
+                if piece != 'pawn':
                     # Removal of piece from the board
-                    self._white_locations.pop(selection)
-                    self._white_pieces.pop(selection)
-            # Checks if the square contains a black piece
-            elif piece_coordinates in self._black_locations:
-                selection = self._black_locations.index(piece_coordinates)
-                # Checks if the piece is not a pawn
-                if self._black_pieces[selection] != 'pawn':
-                    # Removal of piece from the board
-                    self._black_locations.pop(selection)
-                    self._black_pieces.pop(selection)
+                    del self._white_pieces[piece_coordinates]
+                    self._hash ^= self._zobrist_keys['white'][piece][piece_coordinates[1] * 8 + piece_coordinates[0]]
+                    self._untrack_piece('white', piece)
+                    exploded_pieces.append(('white', piece_coordinates, piece))
+                continue
+            # Checks if the square contains a black piece that is not a pawn
+            piece = self._black_pieces.get(piece_coordinates)
+            if piece is not None and piece != 'pawn':
+                # Removal of piece from the board
+                del self._black_pieces[piece_coordinates]
+                self._hash ^= self._zobrist_keys['black'][piece][piece_coordinates[1] * 8 + piece_coordinates[0]]
+                self._untrack_piece('black', piece)
+                exploded_pieces.append(('black', piece_coordinates, piece))
+        return exploded_pieces
 
     def get_surrounding_squares(self, position):
-        """Calculates the coordinates of adjacent squares (up, down, left, right, and diagonal) around the
-        given position, ensuring they are within the board boundaries. Returns a list of the surrounding squares"""
-        surrounding_squares_list = []
+        """Returns a list of the coordinates of the adjacent squares (up, down, left, right, and diagonal) around the
+        given position that are within the board boundaries"""
+        return list(self._blast_squares[position])
+
+    @staticmethod
+    def _generate_blast_squares():
+        """Generate the surrounding squares of each position on the board, which an explosion there reaches"""
+        blast_squares = {}
 
         # Defines directions for surrounding squares
         targets = [(1, 0), (1, 1), (1, -1), (-1, 0), (-1, 1), (-1, -1), (0, 1), (0, -1)]
 
-        # Iterate over directions to calculate surrounding squares
-        for i in range(8):
-            target = (position[0] + targets[i][0], position[1] + targets[i][1])
-            # Checks if target square is within board boundaries
-            if 0 <= target[0] <= 7 and 0 <= target[1] <= 7:
-                surrounding_squares_list.append(target)
-        return surrounding_squares_list
+        for column in range(8):
+            for row in range(8):
+                surrounding_squares_list = []
+                # Iterate over directions to calculate surrounding squares
+                for i in range(8):
+                    target = (column + targets[i][0], row + targets[i][1])
+                    # Checks if target square is within board boundaries
+                    if 0 <= target[0] <= 7 and 0 <= target[1] <= 7:
+                        surrounding_squares_list.append(target)
+                blast_squares[(column, row)] = tuple(surrounding_squares_list)
+        return blast_squares
 
     def print_board(self):
         """Prints the current state of the chessboard, representing the pieces as characters."""
@@ -519,9 +886,7 @@ class ChessVar:
         board = [[' ' for _ in range(8)] for _ in range(8)]
 
         # White pieces on the board
-        for i in range(len(self._white_locations)):
-            piece = self._white_pieces[i]
-            x, y = self._white_locations[i]
+        for (x, y), piece in self._white_pieces.items():
             # Displays knight piece in uppercase
             if piece == "knight":
                 board[7 - y][x] = piece[1].upper()
@@ -529,9 +894,7 @@ class ChessVar:
                 board[7 - y][x] = piece[0].upper()
 
         # Black pieces on the board
-        for i in range(len(self._black_locations)):
-            piece = self._black_pieces[i]
-            x, y = self._black_locations[i]
+        for (x, y), piece in self._black_pieces.items():
             # Displays knight piece in lowercase
             if piece == "knight":
                 board[7 - y][x] = piece[1]
@@ -0,0 +1,145 @@
+# Description: Bounded cache of the attack and mobility maps of Atomic Chess positions. The maps of both sides are
+# built once per position from the move tables and get_*_possible_moves methods of a ChessVar and stored, read-only,
+# under the position hash, so that asking again for the moves of a position, or of a position reached by another move
+# order, costs one lookup. The cache holds at most a fixed number of positions and evicts the least recently used
+# one, or the oldest one.
+
+import collections
+import types
+
+AttackMaps = collections.namedtuple('AttackMaps', ['white_moves', 'black_moves', 'white_destinations',
+                                                   'black_destinations', 'white_attacks', 'black_attacks'])
+AttackMaps.__doc__ = """The maps of a position. For each color: a read-only mapping from the (column, row) location of
+every piece to the tuple of locations it can move to, as generate_moves allows them; the frozenset of every location
+its pieces can move to, pawn pushes included; and the frozenset of every location its pieces attack, with the same
+meaning as batch.attack_maps: the squares a capture could land on, whatever stands on them, own pieces included, with
+pawns attacking diagonally forward only and kings attacking nothing since they cannot capture"""
+
+EVICTION_POLICIES = ('lru', 'fifo')
+# Square notation of every (column, row) location, so that cached moves are converted without string arithmetic
+_LOCATION_SQUARES = {(column, row): chr(ord('a') + column) + str(row + 1) for column in range(8) for row in range(8)}
+
+
+def _attacks(game, pieces, occupied, forward):
+    """Returns the frozenset of locations attacked by the given pieces, whose pawns capture towards row offset
+    forward. Sliding pieces attack along each ray up to and including the first occupied square"""
+    attacks = set()
+    for location, piece in pieces.items():
+        if piece == 'pawn':
+            column, row = location
+            attacks.update((capture_column, row + forward) for capture_column in (column - 1, column + 1)
+                           if 0 <= capture_column < 8 and 0 <= row + forward < 8)
+        elif piece == 'knight':
+            attacks.update(game._knight_possible_moves[location])
+        elif piece != 'king':
+            ray_tables = (game._bishop_possible_moves,) if piece == 'bishop' else \
+                (game._rook_possible_moves,) if piece == 'rook' else \
+                (game._bishop_possible_moves, game._rook_possible_moves)
+            for table in ray_tables:
+                for ray in table[location].values():
+                    for target in ray:
+                        attacks.add(target)
+                        if target in occupied:
+                            break
+    return frozenset(attacks)
+
+
+def build_attack_maps(game):
+    """Builds the AttackMaps of a game's position for both sides, whichever side is to move"""
+    occupied = game._white_pieces.keys() | game._black_pieces.keys()
+    maps = []
+    for color, pieces, opponent_pieces, forward in (('white', game._white_pieces, game._black_pieces, 1),
+                                                    ('black', game._black_pieces, game._white_pieces, -1)):
+        moves = {}
+        for location, piece in pieces.items():
+            targets = game._get_piece_possible_moves(piece, location, color)
+            if piece == 'king':
+                # Kings cannot capture
+                targets = [target for target in targets if target not in opponent_pieces]
+            moves[location] = tuple(targets)
+        # The cached maps are handed to every caller, so none of them may be changed
+        maps.append((types.MappingProxyType(moves),
+                     frozenset(target for targets in moves.values() for target in targets),
+                     _attacks(game, pieces, occupied, forward)))
+    (white_moves, white_destinations, white_attacks), (black_moves, black_destinations, black_attacks) = maps
+    return AttackMaps(white_moves, black_moves, white_destinations, black_destinations, white_attacks, black_attacks)
+
+
+class AttackMapCache:
+    """An LRU (or FIFO) cache of AttackMaps keyed by position. Positions that differ only in the side to move share
+    an entry, since the maps of both sides do not depend on whose turn it is"""
+
+    def __init__(self, max_entries=4096, eviction='lru'):
+        """Creates an empty cache holding at most max_entries positions. With eviction 'lru', a full cache evicts the
+        position used least recently; with 'fifo', the position added first. Raises ValueError for another policy"""
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError('unknown eviction policy %r' % eviction)
+        if max_entries < 1:
+            raise ValueError('max_entries must be at least 1')
+        self._max_entries = max_entries
+        self._lru = eviction == 'lru'
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """Returns the number of positions in the cache"""
+        return len(self._entries)
+
+    @staticmethod
+    def _key(game):
+        """Returns the position hash of the game with the side to move left out"""
+        position_hash = game.get_position_hash()
+        if game._turn == 'black':
+            position_hash ^= game._zobrist_black_to_move
+        return position_hash
+
+    def get(self, game):
+        """Returns the AttackMaps of the game's position, building and storing them if they are not cached"""
+        key = self._key(game)
+        entries = self._entries
+        maps = entries.get(key)
+        if maps is not None:
+            self.hits += 1
+            if self._lru:
+                entries.move_to_end(key)
+            return maps
+        self.misses += 1
+        maps = entries[key] = build_attack_maps(game)
+        if len(entries) > self._max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return maps
+
+    def piece_moves(self, game, square):
+        """Returns the squares, in square notation, that the piece on the given square can move to, or an empty list
+        if the square is empty"""
+        location = game.convert_square_to_location(square)
+        maps = self.get(game)
+        targets = maps.white_moves.get(location)
+        if targets is None:
+            targets = maps.black_moves.get(location, ())
+        return [_LOCATION_SQUARES[target] for target in targets]
+
+    def legal_moves(self, game):
+        """Returns the legal moves of the side to move as (square moved from, square moved to) pairs in square
+        notation: the same moves as game.generate_moves, read from the cache"""
+        if game.get_game_state() != 'UNFINISHED':
+            return []
+        maps = self.get(game)
+        moves = maps.white_moves if game._turn == 'white' else maps.black_moves
+        square = _LOCATION_SQUARES
+        return [(square[location], square[target]) for location, targets in moves.items() for target in targets]
+
+    def clear(self):
+        """Empties the cache and resets the statistics"""
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Returns a dict of the number of cached positions, hits, misses, evictions and the hit rate"""
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries), 'max_entries': self._max_entries, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
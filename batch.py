@@ -0,0 +1,222 @@
+# Description: NumPy-vectorized features for many Atomic Chess positions at once. A batch of N positions is an (N, 64)
+# int8 array indexed by square = row * 8 + column, holding 0 for an empty square, the piece code (pawn 1 to king 6,
+# as in encoding.py) for a white piece and its negative for a black piece. Attack maps and mobility are computed for
+# the whole batch by shifting arrays of 64-bit bitboards, and explosions as 3x3 convolutions over every board, instead
+# of calling the get_*_possible_moves methods one board at a time. Requires NumPy.
+
+import functools
+
+import numpy as np
+
+from encoding import PIECE_CODES, POSITION_SIZE
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = (PIECE_CODES[piece]
+                                           for piece in ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king'))
+# Material value of each piece code, in hundredths of a pawn, as in search.py
+PIECE_VALUES = np.array([0, 100, 300, 300, 500, 900, 0], dtype=np.int32)
+
+KNIGHT_OFFSETS = ((2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2), (1, -2), (2, -1))
+KING_OFFSETS = tuple((dc, dr) for dc in (-1, 0, 1) for dr in (-1, 0, 1) if dc or dr)
+ROOK_DIRECTIONS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+# Colors in the second axis of per-side feature arrays, with the sign of their piece codes
+SIDES = (('white', 1), ('black', -1))
+
+
+def _blast_masks():
+    """Returns a (64, 64) bool array whose row s marks the squares destroyed by an explosion on square s: s itself
+    and the squares around it"""
+    masks = np.zeros((64, 8, 8), dtype=bool)
+    for square in range(64):
+        row, column = divmod(square, 8)
+        masks[square, max(row - 1, 0):row + 2, max(column - 1, 0):column + 2] = True
+    return masks.reshape(64, 64)
+
+
+BLAST_MASKS = _blast_masks()
+
+
+def boards_from_games(games):
+    """Loads the positions of a sequence of ChessVar games into an (N, 64) board array, and returns it with an (N,)
+    bool array that is True where black is to move"""
+    boards = np.zeros((len(games), 64), dtype=np.int8)
+    black_to_move = np.zeros(len(games), dtype=bool)
+    for index, game in enumerate(games):
+        board = boards[index]
+        for (column, row), piece in game._white_pieces.items():
+            board[row * 8 + column] = PIECE_CODES[piece]
+        for (column, row), piece in game._black_pieces.items():
+            board[row * 8 + column] = -PIECE_CODES[piece]
+        black_to_move[index] = game._turn == 'black'
+    return boards, black_to_move
+
+
+def boards_from_bytes(buffer):
+    """Loads back-to-back 33-byte position encodings (see encoding.py) from a bytes object, memoryview or mmap into
+    an (N, 64) board array without decoding them one by one, and returns it with the (N,) black-to-move array"""
+    records = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, POSITION_SIZE)
+    nibbles = np.empty((len(records), 64), dtype=np.int8)
+    nibbles[:, 0::2] = records[:, :32] & 15
+    nibbles[:, 1::2] = records[:, :32] >> 4
+    boards = np.where(nibbles & 8, -(nibbles & 7), nibbles).astype(np.int8)
+    return boards, records[:, 32] != 0
+
+
+def to_planes(boards):
+    """Returns the (N, 12, 8, 8) bool planes of a board array: the six white piece types from pawn to king, then the
+    six black ones, each indexed by [row, column]"""
+    grids = boards.reshape(-1, 8, 8)
+    planes = [grids == code for code in range(1, 7)] + [grids == -code for code in range(1, 7)]
+    return np.stack(planes, axis=1)
+
+
+def _popcount(bitboards):
+    """Returns the number of set bits of each 64-bit integer in an array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bitboards).astype(np.int32)
+    bits = np.unpackbits(bitboards.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1)
+    return bits.sum(axis=1, dtype=np.int32)
+
+
+def _column_mask(columns):
+    """Returns the bitboard of every square in the given columns"""
+    return np.uint64(sum(1 << (row * 8 + column) for row in range(8) for column in columns))
+
+
+# Squares that stay on the board when moved by each column offset
+_KEEP_COLUMNS = {offset: _column_mask([column for column in range(8) if 0 <= column + offset < 8])
+                 for offset in range(-2, 3)}
+_FIRST_ROWS = {1: np.uint64(0xFF << 8), -1: np.uint64(0xFF << 48)}
+
+
+def _shift(bitboards, column_offset, row_offset):
+    """Returns (N,) bitboards with every square moved by the given column and row offsets, dropping the squares
+    that would leave the board"""
+    bitboards = bitboards & _KEEP_COLUMNS[column_offset]
+    offset = row_offset * 8 + column_offset
+    return bitboards << np.uint64(offset) if offset >= 0 else bitboards >> np.uint64(-offset)
+
+
+def _bitboards(boards):
+    """Returns a dict mapping each signed piece code to the (N,) bitboards of that piece on a board array"""
+    return {code: np.packbits(boards == code, axis=1, bitorder='little').view('<u8').ravel().astype(np.uint64)
+            for code in range(-KING, KING + 1) if code}
+
+
+def _side_moves(pieces, sign):
+    """Returns the (N,) move counts and attack bitboards of one side, given the piece bitboards of _bitboards. Move
+    counts follow the rules of generate_moves, pawn moves and the ban on king captures included. The attack map
+    marks every square the side's pieces hit, whatever stands on it, except that kings do not attack since they
+    cannot capture. For a given offset or direction, the targets of two pieces of the same type never overlap, so
+    counting the bits of each shifted bitboard counts every move once"""
+    own = functools.reduce(np.bitwise_or, (pieces[sign * code] for code in range(1, 7)))
+    opponent = functools.reduce(np.bitwise_or, (pieces[-sign * code] for code in range(1, 7)))
+    empty = ~(own | opponent)
+    not_own = ~own
+    moves = np.zeros(len(own), dtype=np.int32)
+    attacks = np.zeros(len(own), dtype=np.uint64)
+
+    for column_offset, row_offset in KNIGHT_OFFSETS:
+        targets = _shift(pieces[sign * KNIGHT], column_offset, row_offset)
+        moves += _popcount(targets & not_own)
+        attacks |= targets
+
+    for column_offset, row_offset in KING_OFFSETS:
+        moves += _popcount(_shift(pieces[sign * KING], column_offset, row_offset) & empty)
+
+    for directions, code in ((ROOK_DIRECTIONS, ROOK), (BISHOP_DIRECTIONS, BISHOP)):
+        sliders = pieces[sign * code] | pieces[sign * QUEEN]
+        for column_offset, row_offset in directions:
+            # Each ray advances while it crosses empty squares and stops on the first occupied one
+            rays = sliders
+            for _ in range(7):
+                rays = _shift(rays, column_offset, row_offset)
+                moves += _popcount(rays & not_own)
+                attacks |= rays
+                rays &= empty
+                if not rays.any():
+                    break
+
+    pawns = pieces[sign * PAWN]
+    forward = 1 if sign > 0 else -1
+    for column_offset in (1, -1):
+        targets = _shift(pawns, column_offset, forward)
+        moves += _popcount(targets & opponent)
+        attacks |= targets
+    # Pawns also move sideways through the pawn move tables of ChessVar: white pawns one column right, or two from
+    # the b-file, and black pawns one column left, or two from the g-file
+    moves += _popcount(_shift(pawns, forward, 0) & empty)
+    moves += _popcount(_shift(pawns & _column_mask([1 if sign > 0 else 6]), 2 * forward, 0) & empty)
+    # Double steps from the starting row, when both squares ahead are empty
+    single_steps = _shift(pawns & _FIRST_ROWS[forward], 0, forward) & empty
+    moves += _popcount(_shift(single_steps, 0, forward) & empty)
+    return moves, attacks
+
+
+def _unpack(bitboards):
+    """Returns the (N, 64) bool squares of (N,) bitboards"""
+    return np.unpackbits(bitboards.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1,
+                         bitorder='little').astype(bool)
+
+
+def attack_maps(boards):
+    """Returns an (N, 2, 64) bool array of the squares attacked by white and by black on each board"""
+    pieces = _bitboards(boards)
+    return np.stack([_unpack(_side_moves(pieces, sign)[1]) for _, sign in SIDES], axis=1)
+
+
+def explosion_damage(boards):
+    """Returns an (N, 2, 64) int array giving, for a capture on each square, the material that white and black
+    would lose to the explosion: every non-pawn piece in the 3x3 blast, plus the captured piece itself. The
+    capturing piece, which depends on the move, is not counted. The 3x3 convolution over every board is a single
+    product with the blast masks"""
+    codes = np.abs(boards)
+    values = PIECE_VALUES[codes]
+    non_pawn_values = np.where(codes > PAWN, values, 0)
+    pawn_values = np.where(codes == PAWN, values, 0)
+    blast_masks = BLAST_MASKS.astype(np.int32)
+    damage = []
+    for _, sign in SIDES:
+        own = boards * sign > 0
+        damage.append(np.where(own, non_pawn_values, 0) @ blast_masks + np.where(own, pawn_values, 0))
+    return np.stack(damage, axis=1)
+
+
+def features(boards):
+    """Computes per-board features for a batch. Returns a dict of arrays with one row per board and one column per
+    side (white, black):
+    material: total piece value;
+    mobility: number of moves the side would have if it were to move;
+    king_danger: number of the side's pieces in the blast area of its own king, the king included, that the opponent
+    can capture, each capture exploding the king;
+    attacks: (N, 2, 64) attack maps, as returned by attack_maps"""
+    pieces = _bitboards(boards)
+    side_moves = [_side_moves(pieces, sign) for _, sign in SIDES]
+    material = np.stack([np.where(boards * sign > 0, PIECE_VALUES[np.abs(boards)], 0).sum(axis=1)
+                         for _, sign in SIDES], axis=1)
+    king_danger = []
+    for index, (_, sign) in enumerate(SIDES):
+        king = pieces[sign * KING]
+        king_area = functools.reduce(np.bitwise_or, (_shift(king, column_offset, row_offset)
+                                                     for column_offset, row_offset in KING_OFFSETS), king)
+        own = functools.reduce(np.bitwise_or, (pieces[sign * code] for code in range(1, 7)))
+        king_danger.append(_popcount(king_area & own & side_moves[1 - index][1]))
+    return {'material': material,
+            'mobility': np.stack([moves for moves, _ in side_moves], axis=1),
+            'king_danger': np.stack(king_danger, axis=1),
+            'attacks': np.stack([_unpack(attacks) for _, attacks in side_moves], axis=1)}
+
+
+def apply_moves(boards, from_squares, to_squares):
+    """Plays one move on each board, given as (N,) arrays of 0-63 squares, and returns the resulting boards. The
+    moves are assumed legal. Where the destination holds a piece, the capturing and captured pieces are removed and
+    every non-pawn piece in the blast around the destination explodes; otherwise the piece simply moves"""
+    rows = np.arange(len(boards))
+    result = boards.copy()
+    moving = result[rows, from_squares]
+    captures = result[rows, to_squares] != 0
+    result[rows, from_squares] = 0
+    result[rows, to_squares] = np.where(captures, 0, moving)
+    blasted = BLAST_MASKS[to_squares] & captures[:, None] & (np.abs(result) > PAWN)
+    result[blasted] = 0
+    return result
@@ -0,0 +1,222 @@
+# Description: Benchmarks for the Atomic Chess game. Each benchmark prints a small report to the console and can be
+# run on its own from the command line, e.g. "python benchmarks.py construction".
+
+import argparse
+import concurrent.futures
+import os
+import random
+import time
+import tracemalloc
+
+from ChessVar import ChessVar
+
+
+def _rebuild_possible_moves(game):
+    """Gives a game its own copy of every move table, the way each ChessVar was built before the tables were shared"""
+    game._king_possible_moves = ChessVar._generate_king_possible_moves()
+    game._bishop_possible_moves = ChessVar._generate_bishop_possible_moves()
+    game._knight_possible_moves = ChessVar._generate_knight_possible_moves()
+    game._rook_possible_moves = ChessVar._generate_rook_possible_moves()
+    game._white_pawn_possible_moves = ChessVar._generate_pawn_possible_moves('white')
+    game._black_pawn_possible_moves = ChessVar._generate_pawn_possible_moves('black')
+
+
+def _time_per_call(function, count):
+    """Calls a function count times and returns the average number of microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def _bytes_per_instance(function, count):
+    """Keeps count results of a function alive and returns the average number of bytes allocated for each one"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [function() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del instances
+    return (after - before) / count
+
+
+def bench_construction(count=2000):
+    """Compares the construction time and the memory held per game when every game rebuilds its own move tables,
+    when games share the tables, and when games are created from an existing position"""
+    position = ChessVar().get_position()
+
+    def rebuilt():
+        game = ChessVar()
+        _rebuild_possible_moves(game)
+        return game
+
+    constructors = [
+        ('per-game tables', rebuilt),
+        ('ChessVar()', ChessVar),
+        ('ChessVar.from_position()', lambda: ChessVar.from_position(position[1], position[2], position[0])),
+    ]
+    print('%-26s %14s %16s' % ('constructor', 'us/game', 'bytes/game'))
+    results = {}
+    for name, constructor in constructors:
+        microseconds = _time_per_call(constructor, count)
+        memory = _bytes_per_instance(constructor, min(count, 500))
+        results[name] = {'us_per_game': microseconds, 'bytes_per_game': memory}
+        print('%-26s %14.1f %16.0f' % (name, microseconds, memory))
+    return results
+
+
+def _opening_moves(plies=20):
+    """Returns the first plies moves of a fixed random game, in square notation"""
+    generator = random.Random(20)
+    game = ChessVar()
+    moves = []
+    for _ in range(plies):
+        move = generator.choice(sorted(game.generate_moves()))
+        game.make_move(*move)
+        moves.append(move)
+    return moves
+
+
+def bench_memory(count=20000):
+    """Compares the bytes held per live game by ChessVar and by CompactChessVar, in the starting position and after
+    20 moves, with the 33-byte encoding as a floor"""
+    from compact import CompactChessVar
+
+    moves = _opening_moves()
+
+    def played(game_class):
+        def construct():
+            game = game_class()
+            for move in moves:
+                game.make_move(*move)
+            return game
+        return construct
+
+    constructors = [
+        ('ChessVar()', ChessVar),
+        ('ChessVar, 20 moves', played(ChessVar)),
+        ('CompactChessVar()', CompactChessVar),
+        ('CompactChessVar, 20 moves', played(CompactChessVar)),
+        ('to_bytes()', lambda: ChessVar().to_bytes()),
+    ]
+    print('%-26s %16s %12s' % ('game', 'bytes/game', 'ratio'))
+    results = {}
+    for name, constructor in constructors:
+        results[name] = _bytes_per_instance(constructor, count)
+        print('%-26s %16.0f %11.1fx' % (name, results[name], results['ChessVar()'] / results[name]))
+    return results
+
+
+def _random_positions(count, seed=0):
+    """Returns count games holding the positions reached by random walks from the starting position, with seeds
+    seed, seed + 1, ..."""
+    from selfplay import random_walk
+
+    positions = []
+    while len(positions) < count:
+        for game, _ in random_walk(seed):
+            positions.append(ChessVar.from_position(*game.get_position()[1:], turn=game._turn))
+            if len(positions) == count:
+                break
+        seed += 1
+    return positions
+
+
+def bench_movegen(count=5000):
+    """Compares the move generation backends on the same random positions, both returning the moves as pairs of
+    locations: the bitboard backend with its caches empty and once they are filled, then perft to depth 4 from the
+    starting position with each backend"""
+    from bitboard import generate_location_moves
+    from perft import perft
+
+    positions = _random_positions(count)
+    backends = [
+        ('lists', lambda game: list(game._generate_list_moves())),
+        ('bitboard, first pass', generate_location_moves),
+        ('bitboard, cached', generate_location_moves),
+    ]
+    print('%-24s %14s %10s' % ('backend', 'us/position', 'speedup'))
+    results = {}
+    for name, generate in backends:
+        start = time.perf_counter()
+        for game in positions:
+            generate(game)
+        results[name] = (time.perf_counter() - start) / count * 1e6
+        print('%-24s %14.1f %9.2fx' % (name, results[name], results['lists'] / results[name]))
+    backend = ChessVar._move_generation
+    try:
+        for name in ('lists', 'bitboard'):
+            ChessVar.set_move_generation(name)
+            start = time.perf_counter()
+            perft(ChessVar(), 4)
+            results['perft 4, %s' % name] = seconds = time.perf_counter() - start
+            print('%-24s %13.3fs %9.2fx' % ('perft 4, %s' % name, seconds, results['perft 4, lists'] / seconds))
+    finally:
+        ChessVar.set_move_generation(backend)
+    return results
+
+
+def _benchmark_positions():
+    """Returns a few opening and middlegame games used to benchmark searches"""
+    lines = [
+        [],
+        [('e2', 'e4'), ('g8', 'f6'), ('g1', 'f3')],
+        [('d2', 'd4'), ('e7', 'e5'), ('b1', 'c3'), ('b8', 'c6'), ('c1', 'g5')],
+    ]
+    games = []
+    for line in lines:
+        game = ChessVar()
+        for square_from, square_to in line:
+            game.make_move(square_from, square_to)
+        games.append(game)
+    return games
+
+
+def bench_parallel(depth=4):
+    """Measures how the multi-process search scales with 1, 2, 4, 8 and all CPU workers. Each worker pool is started
+    and warmed up before timing, so only the search itself is measured"""
+    from parallel_search import parallel_best_move
+
+    cpus = os.cpu_count() or 1
+    games = _benchmark_positions()
+    print('%8s %10s %12s %12s %9s' % ('workers', 'seconds', 'nodes', 'nodes/s', 'speedup'))
+    results = {}
+    for workers in sorted({1, 2, 4, 8, cpus}):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            parallel_best_move(games[0], 1, workers=workers, executor=executor)
+            start = time.perf_counter()
+            nodes = 0
+            for game in games:
+                nodes += parallel_best_move(game, depth, workers=workers, executor=executor).nodes
+            seconds = time.perf_counter() - start
+        results[workers] = {'seconds': seconds, 'nodes': nodes, 'nodes_per_second': nodes / seconds}
+        print('%8d %10.2f %12d %12.0f %8.2fx' % (workers, seconds, nodes, nodes / seconds,
+                                                 results[1]['seconds'] / seconds))
+    if cpus < 8:
+        print('Note: this machine has %d CPU(s), so runs with more workers than CPUs cannot scale' % cpus)
+    return results
+
+
+BENCHMARKS = {
+    'construction': bench_construction,
+    'memory': bench_memory,
+    'movegen': bench_movegen,
+    'parallel': bench_parallel,
+}
+
+
+def main():
+    """Runs the benchmarks named on the command line, or all of them"""
+    parser = argparse.ArgumentParser(description='Atomic Chess benchmarks')
+    parser.add_argument('names', nargs='*', help='benchmarks to run: %s' % ', '.join(sorted(BENCHMARKS)))
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark %r' % name)
+    for name in args.names or sorted(BENCHMARKS):
+        print('== %s ==' % name)
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
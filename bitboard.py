@@ -0,0 +1,231 @@
+# Description: Bitboard move generation backend for ChessVar, chosen with ChessVar.set_move_generation('bitboard'). The
+# squares held by each side are gathered into 64-bit integers, where bit (row * 8 + column) stands for the (column,
+# row) location. The moves of a piece depend only on its square and on the pieces standing on the squares it could
+# reach, so each piece's move list is looked up in a per-square cache keyed by those few bits, and computed from
+# precomputed attack masks and classical ray scans only the first time that arrangement is seen. Attack masks are
+# derived from the move tables generated by ChessVar, so both backends share one definition of how pieces move. The
+# caches hold at most CACHE_LIMIT move lists in all, about 420 bytes each, so about 14 MB at the default limit.
+
+from ChessVar import ChessVar
+
+WHITE, BLACK = range(2)
+# Move lists cached over every piece and square before all the caches are emptied and filled again
+CACHE_LIMIT = 32768
+
+_tables = None
+# Per-square move caches for each piece, the pawns of each color apart, built with the tables, and the number of move
+# lists they hold
+_move_caches = None
+_cached_move_lists = 0
+
+
+def location_to_square(location):
+    """Converts a (column, row) location to its 0-63 square index"""
+    return location[1] * 8 + location[0]
+
+
+def square_to_location(square):
+    """Converts a 0-63 square index to its (column, row) location"""
+    return (square & 7, square >> 3)
+
+
+# Location, square index and bit of every square, so that generation does no arithmetic to convert between them
+_LOCATIONS = tuple(square_to_location(square) for square in range(64))
+_LOCATION_SQUARES = {location: square for square, location in enumerate(_LOCATIONS)}
+_LOCATION_BITS = {location: 1 << square for square, location in enumerate(_LOCATIONS)}
+
+
+def _mask(locations):
+    """Returns the bitboard with a bit set for each of the given locations"""
+    mask = 0
+    for location in locations:
+        mask |= 1 << location_to_square(location)
+    return mask
+
+
+def _ray_tables(possible_moves):
+    """Converts a table of directional moves from ChessVar into a list of (ray mask, increasing) pairs per square, with
+    the directions in the same order for every square. A ray is increasing when its squares have higher indices than
+    the origin, so the nearest blocker on it is the least significant set bit; otherwise it is the most significant."""
+    increasing = {}
+    for location, moves in possible_moves.items():
+        for direction, direction_moves in moves.items():
+            if direction_moves:
+                increasing[direction] = location_to_square(direction_moves[0]) > location_to_square(location)
+    rays = [None] * 64
+    for location, moves in possible_moves.items():
+        rays[location_to_square(location)] = [(_mask(moves[direction]), increasing[direction])
+                                              for direction in sorted(increasing)]
+    return rays
+
+
+def get_tables():
+    """Builds the attack, ray and pawn masks on first use and returns them. The tables are derived from the
+    move tables generated by ChessVar so that both backends share one definition of how pieces move. 'reach' maps
+    each piece to the squares, per square, whose contents its moves depend on"""
+    global _tables, _move_caches
+    if _tables is None:
+        if ChessVar._king_possible_moves is None:
+            ChessVar._load_shared_tables()
+        tables = {
+            'king': [0] * 64,
+            'knight': [0] * 64,
+            'rook_rays': _ray_tables(ChessVar._rook_possible_moves),
+            'bishop_rays': _ray_tables(ChessVar._bishop_possible_moves),
+            'pawn_pushes': ([0] * 64, [0] * 64),
+            'pawn_captures': ([0] * 64, [0] * 64),
+        }
+        for location, moves in ChessVar._king_possible_moves.items():
+            tables['king'][location_to_square(location)] = _mask(moves)
+        for location, moves in ChessVar._knight_possible_moves.items():
+            tables['knight'][location_to_square(location)] = _mask(moves)
+        for color, pawn_moves in ((WHITE, ChessVar._white_pawn_possible_moves),
+                                  (BLACK, ChessVar._black_pawn_possible_moves)):
+            direction = 1 if color == WHITE else -1
+            for location, moves in pawn_moves.items():
+                square = location_to_square(location)
+                tables['pawn_pushes'][color][square] = _mask(moves)
+                column, row = location
+                targets = [(column + 1, row + direction), (column - 1, row + direction)]
+                tables['pawn_captures'][color][square] = _mask(
+                    [target for target in targets if 0 <= target[0] <= 7 and 0 <= target[1] <= 7])
+        rook_reach = [_ray_union(rays) for rays in tables['rook_rays']]
+        bishop_reach = [_ray_union(rays) for rays in tables['bishop_rays']]
+        tables['reach'] = {
+            'knight': tables['knight'],
+            'bishop': bishop_reach,
+            'rook': rook_reach,
+            'queen': [rook_reach[square] | bishop_reach[square] for square in range(64)],
+            'king': tables['king'],
+            WHITE: [_pawn_reach(tables, WHITE, square) for square in range(64)],
+            BLACK: [_pawn_reach(tables, BLACK, square) for square in range(64)],
+        }
+        _move_caches = {key: [{} for _ in range(64)] for key in tables['reach']}
+        _tables = tables
+    return _tables
+
+
+def clear_caches():
+    """Empties the move caches, freeing the memory they hold. ChessVar.set_move_generation('lists') calls it"""
+    global _cached_move_lists
+    if _move_caches is not None:
+        for caches in _move_caches.values():
+            for cache in caches:
+                cache.clear()
+    _cached_move_lists = 0
+
+
+def _ray_union(rays):
+    """Returns the bitboard of every square on the given rays"""
+    mask = 0
+    for ray, _ in rays:
+        mask |= ray
+    return mask
+
+
+def _pawn_reach(tables, color, square):
+    """Returns the squares whose contents the moves of a pawn of the given color index on a square depend on"""
+    reach = tables['pawn_pushes'][color][square] | tables['pawn_captures'][color][square]
+    row = square >> 3
+    if color == WHITE and row == 1:
+        reach |= (1 << (square + 8)) | (1 << (square + 16))
+    elif color == BLACK and row == 6:
+        reach |= (1 << (square - 8)) | (1 << (square - 16))
+    return reach
+
+
+def _slide(square, occupied, rays):
+    """Returns the squares attacked from a square along the given rays, up to and including the first blocker"""
+    attacks = 0
+    for direction, (ray, increasing) in enumerate(rays[square]):
+        blockers = ray & occupied
+        if blockers:
+            if increasing:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            # Everything past the blocker lies on the ray leaving the blocker in the same direction
+            ray &= ~rays[blocker][direction][0]
+        attacks |= ray
+    return attacks
+
+
+def piece_moves(piece, square, color, ally, opponent):
+    """Returns the bitboard of the squares a piece of the given color index on a square can move to, given the
+    bitboards of the ally and opponent pieces. Follows the get_*_possible_moves methods of ChessVar, except that kings
+    are not given the squares of opponent pieces, since they cannot capture"""
+    tables = get_tables()
+    occupied = ally | opponent
+    if piece == 'pawn':
+        moves = tables['pawn_pushes'][color][square] & ~occupied
+        moves |= tables['pawn_captures'][color][square] & opponent
+        row = square >> 3
+        if color == WHITE and row == 1:
+            if not ((1 << (square + 8)) | (1 << (square + 16))) & occupied:
+                moves |= 1 << (square + 16)
+        elif color == BLACK and row == 6:
+            if not ((1 << (square - 8)) | (1 << (square - 16))) & occupied:
+                moves |= 1 << (square - 16)
+        return moves
+    if piece == 'knight':
+        return tables['knight'][square] & ~ally
+    if piece == 'king':
+        return tables['king'][square] & ~occupied
+    moves = 0
+    if piece != 'bishop':
+        moves |= _slide(square, occupied, tables['rook_rays'])
+    if piece != 'rook':
+        moves |= _slide(square, occupied, tables['bishop_rays'])
+    return moves & ~ally
+
+
+def _location_moves(location, moves):
+    """Returns a tuple of (location, target location) pairs for every square of a bitboard of moves"""
+    pairs = []
+    while moves:
+        bit = moves & -moves
+        moves ^= bit
+        pairs.append((location, _LOCATIONS[bit.bit_length() - 1]))
+    return tuple(pairs)
+
+
+def generate_location_moves(game):
+    """Returns every legal move for the side to move of a ChessVar as a list of pairs of (column, row) locations: the
+    same moves as the list-based generation, though not in the same order"""
+    global _cached_move_lists
+    if game._state != 'UNFINISHED':
+        return []
+    if _tables is None:
+        get_tables()
+    if game._turn == 'white':
+        ally_pieces, opponent_pieces, color = game._white_pieces, game._black_pieces, WHITE
+    else:
+        ally_pieces, opponent_pieces, color = game._black_pieces, game._white_pieces, BLACK
+    bits = _LOCATION_BITS
+    ally = 0
+    for location in ally_pieces:
+        ally |= bits[location]
+    opponent = 0
+    for location in opponent_pieces:
+        opponent |= bits[location]
+    reach = _tables['reach']
+    caches = _move_caches
+    squares = _LOCATION_SQUARES
+    moves = []
+    for location, piece in ally_pieces.items():
+        square = squares[location]
+        key = color if piece == 'pawn' else piece
+        piece_reach = reach[key][square]
+        # The moves depend only on which reachable squares hold ally and which hold opponent pieces
+        arrangement = (ally & piece_reach) << 64 | (opponent & piece_reach)
+        cache = caches[key][square]
+        location_moves = cache.get(arrangement)
+        if location_moves is None:
+            if _cached_move_lists >= CACHE_LIMIT:
+                clear_caches()
+            _cached_move_lists += 1
+            location_moves = cache[arrangement] = _location_moves(
+                location, piece_moves(piece, square, color, ally, opponent))
+        moves += location_moves
+    return moves
+
@@ -0,0 +1,132 @@
+# Description: Position book for Atomic Chess. A book is a file of fixed-size records sorted by position hash, each
+# holding the best move found for the position, its score and the number of games that reached the position. The
+# file is opened with mmap and searched by binary search, so a large book costs no load time and its pages are shared
+# by every process that opens it. Books are built offline from an archive of games.
+
+import collections
+import mmap
+import struct
+
+from ChessVar import ChessVar
+from encoding import decode_move, encode_move
+
+MAGIC = b'ACBK'
+# Magic bytes followed by the number of records
+HEADER = struct.Struct('<4sI')
+# Position hash, 16-bit encoded move, score and number of games
+RECORD = struct.Struct('<QHiI')
+
+BookEntry = collections.namedtuple('BookEntry', ['move', 'score', 'games'])
+BookEntry.__doc__ = """A book record: the best move as a (square moved from, square moved to) pair in square
+notation, its score for the side to move as the number of games won minus the number lost after it (not hundredths
+of a pawn, unlike SearchResult.score), and the number of games that reached the position"""
+
+
+def write_book(path, records):
+    """Writes a book file from an iterable of (position hash, (location moved from, location moved to), score,
+    games) records, sorting them by hash. When a hash appears more than once, the record with the most games is
+    kept. Returns the number of records written"""
+    best = {}
+    for position_hash, move, score, games in records:
+        current = best.get(position_hash)
+        if current is None or games > current[2]:
+            best[position_hash] = (encode_move(*move), score, games)
+    with open(path, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, len(best)))
+        for position_hash in sorted(best):
+            output.write(RECORD.pack(position_hash, *best[position_hash]))
+    return len(best)
+
+
+def build_book(path, games, max_plies=20, min_games=1):
+    """Builds a book from an iterable of games, each a list of (square moved from, square moved to) pairs, and
+    writes it to path. Every position within the first max_plies moves of a game is recorded together with the move
+    played from it. The book move of a position is the move that scored best for the side that played it, counting
+    +1 for a game that side went on to win and -1 for a loss, with ties going to the more frequent move. Positions
+    reached by fewer than min_games games are left out. Returns the number of positions written"""
+    # position hash -> move -> [games, score]
+    statistics = collections.defaultdict(dict)
+    game = ChessVar()
+    for moves in games:
+        game.reset()
+        played = []
+        for index, (square_from, square_to) in enumerate(moves):
+            if game.get_game_state() != 'UNFINISHED' or not game.is_legal(square_from, square_to):
+                break
+            if index < max_plies:
+                played.append((game.get_position_hash(), game._turn,
+                               (game.convert_square_to_location(square_from),
+                                game.convert_square_to_location(square_to))))
+            game.make_move(square_from, square_to)
+        state = game.get_game_state()
+        winner = 'white' if state == 'WHITE_WON' else 'black' if state == 'BLACK_WON' else None
+        for position_hash, turn, move in played:
+            move_statistics = statistics[position_hash].setdefault(move, [0, 0])
+            move_statistics[0] += 1
+            if winner is not None:
+                move_statistics[1] += 1 if winner == turn else -1
+
+    def records():
+        for position_hash, moves in statistics.items():
+            total = sum(move_games for move_games, _ in moves.values())
+            if total < min_games:
+                continue
+            move, (_, score) = max(moves.items(), key=lambda item: (item[1][1], item[1][0]))
+            yield position_hash, move, score, total
+
+    return write_book(path, records())
+
+
+class PositionBook:
+    """A read-only book file opened with mmap. Lookups binary-search the records in place, so nothing is loaded up
+    front"""
+
+    def __init__(self, path):
+        """Opens the book file at path. Raises ValueError if it is not a book"""
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap cannot map an empty file
+            self._file.close()
+            raise ValueError('%s is not a position book' % path)
+        magic, self._count = HEADER.unpack_from(self._map, 0) if len(self._map) >= HEADER.size else (None, 0)
+        if magic != MAGIC or len(self._map) != HEADER.size + self._count * RECORD.size:
+            self.close()
+            raise ValueError('%s is not a position book' % path)
+
+    def __len__(self):
+        """Returns the number of positions in the book"""
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the book file"""
+        self._map.close()
+        self._file.close()
+
+    def lookup(self, position_hash):
+        """Returns the BookEntry for a position hash, or None if the position is not in the book"""
+        book_map = self._map
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_hash, move, score, games = RECORD.unpack_from(book_map, HEADER.size + middle * RECORD.size)
+            if record_hash < position_hash:
+                low = middle + 1
+            elif record_hash > position_hash:
+                high = middle
+            else:
+                square_from, square_to = decode_move(move)
+                return BookEntry((_square(square_from), _square(square_to)), score, games)
+        return None
+
+
+def _square(location):
+    """Converts a (column, row) location to square notation"""
+    return chr(ord('a') + location[0]) + str(location[1] + 1)
@@ -0,0 +1,304 @@
+# Description: Memory-lean Atomic Chess game for hosting very many mostly idle games. A CompactChessVar has no
+# __dict__: its slots hold a 64-byte bytearray with one piece code per square (the codes of encoding.py, square =
+# row * 8 + column), the side to move and the square of each king. Move generation reads per-square tables derived
+# once from the shared ChessVar tables, so the rules are exactly those of ChessVar. There is no move history; to
+# search or undo moves, convert the game with to_game.
+
+from ChessVar import ChessVar
+from encoding import BLACK_BIT, PIECE_CODES, POSITION_SIZE
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = (PIECE_CODES[piece]
+                                           for piece in ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king'))
+_CODE_PIECES = {code: piece for piece, code in PIECE_CODES.items()}
+# Marks a king that is no longer on the board
+NO_KING = -1
+
+# Per-square tables shared by every game, built from the ChessVar tables on first use
+_tables = None
+
+
+def _square(location):
+    """Converts a (column, row) location to a 0-63 square"""
+    return location[1] * 8 + location[0]
+
+
+def _load_tables():
+    """Converts the shared ChessVar move tables into tuples indexed by square: the king, knight and blast targets,
+    the bishop and rook rays in the order ChessVar scans them, and the pawn table moves of each color"""
+    global _tables
+    if ChessVar._king_possible_moves is None:
+        ChessVar._load_shared_tables()
+    locations = [(square & 7, square >> 3) for square in range(64)]
+
+    def targets(table):
+        return tuple(tuple(_square(target) for target in table[location]) for location in locations)
+
+    def rays(table, directions):
+        return tuple(tuple(tuple(_square(target) for target in table[location][direction])
+                           for direction in directions) for location in locations)
+
+    _tables = {
+        'king': targets(ChessVar._king_possible_moves),
+        'knight': targets(ChessVar._knight_possible_moves),
+        'blast': targets(ChessVar._blast_squares),
+        'bishop': rays(ChessVar._bishop_possible_moves, ('se', 'sw', 'ne', 'nw')),
+        'rook': rays(ChessVar._rook_possible_moves, ('up', 'down', 'left', 'right')),
+        'white_pawn': targets(ChessVar._white_pawn_possible_moves),
+        'black_pawn': targets(ChessVar._black_pawn_possible_moves),
+    }
+    return _tables
+
+
+class CompactChessVar:
+    """An Atomic Chess game with the same make_move, get_game_state, generate_moves, is_legal and print_board methods
+    as ChessVar, holding its position in a few hundred bytes instead of several kilobytes"""
+
+    __slots__ = ('_board', '_turn', '_white_king', '_black_king')
+
+    def __init__(self):
+        """Creates a game in the starting position with white to move"""
+        self._set_position('white', *ChessVar._starting_pieces())
+
+    def _set_position(self, turn, white_pieces, black_pieces):
+        """Fills the board from dicts mapping (column, row) locations to piece names"""
+        if _tables is None:
+            _load_tables()
+        board = bytearray(64)
+        self._white_king = self._black_king = NO_KING
+        for location, piece in white_pieces.items():
+            board[_square(location)] = PIECE_CODES[piece]
+            if piece == 'king':
+                self._white_king = _square(location)
+        for location, piece in black_pieces.items():
+            board[_square(location)] = PIECE_CODES[piece] | BLACK_BIT
+            if piece == 'king':
+                self._black_king = _square(location)
+        self._board = board
+        # The turn is one of two interned strings, shared by every game
+        self._turn = 'white' if turn == 'white' else 'black'
+
+    @classmethod
+    def from_position(cls, white_pieces, black_pieces, turn='white'):
+        """Creates a game from dicts mapping (column, row) locations to piece names, like ChessVar.from_position"""
+        game = cls.__new__(cls)
+        game._set_position(turn, white_pieces, black_pieces)
+        return game
+
+    @classmethod
+    def from_game(cls, game):
+        """Creates a compact copy of the position of a ChessVar"""
+        return cls.from_position(game._white_pieces, game._black_pieces, game._turn)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Creates a game from the 33-byte encoding of encoding.py without going through piece dicts"""
+        if len(data) != POSITION_SIZE:
+            raise ValueError('a position is %d bytes, not %d' % (POSITION_SIZE, len(data)))
+        game = cls.__new__(cls)
+        if _tables is None:
+            _load_tables()
+        board = bytearray(64)
+        board[0::2] = bytes(byte & 15 for byte in data[:32])
+        board[1::2] = bytes(byte >> 4 for byte in data[:32])
+        if any(code & 7 not in _CODE_PIECES for code in board if code):
+            raise ValueError('invalid piece code in position')
+        game._board = board
+        game._turn = 'black' if data[32] else 'white'
+        # find returns -1, which is NO_KING, when there is no king
+        game._white_king = board.find(KING)
+        game._black_king = board.find(KING | BLACK_BIT)
+        return game
+
+    def to_bytes(self):
+        """Returns the 33-byte encoding of the position, the same one ChessVar.to_bytes returns"""
+        board = self._board
+        data = bytearray(POSITION_SIZE)
+        for index in range(32):
+            data[index] = board[2 * index] | board[2 * index + 1] << 4
+        data[32] = 1 if self._turn == 'black' else 0
+        return bytes(data)
+
+    def get_position(self):
+        """Returns the position as a (turn, white pieces, black pieces) tuple, like ChessVar.get_position"""
+        white_pieces = {}
+        black_pieces = {}
+        for square, code in enumerate(self._board):
+            if code:
+                pieces = black_pieces if code & BLACK_BIT else white_pieces
+                pieces[(square & 7, square >> 3)] = _CODE_PIECES[code & 7]
+        return self._turn, white_pieces, black_pieces
+
+    def to_game(self):
+        """Returns a ChessVar with the same position, for searching or anything else needing a full game"""
+        return ChessVar.from_position(*self.get_position()[1:], turn=self._turn)
+
+    def get_position_hash(self):
+        """Returns the Zobrist hash ChessVar.get_position_hash gives for the same position. It is computed from the
+        board on each call, since the game does not store it"""
+        keys = ChessVar._zobrist_keys
+        position_hash = ChessVar._zobrist_black_to_move if self._turn == 'black' else 0
+        for square, code in enumerate(self._board):
+            if code:
+                color = 'black' if code & BLACK_BIT else 'white'
+                position_hash ^= keys[color][_CODE_PIECES[code & 7]][square]
+        return position_hash
+
+    def get_game_state(self):
+        """Returns 'UNFINISHED', 'WHITE_WON' or 'BLACK_WON', like ChessVar.get_game_state"""
+        white_has_king = self._white_king != NO_KING
+        black_has_king = self._black_king != NO_KING
+        if white_has_king and not black_has_king:
+            return 'WHITE_WON'
+        if black_has_king and not white_has_king:
+            return 'BLACK_WON'
+        return 'UNFINISHED'
+
+    def _piece_moves(self, square, code):
+        """Returns the squares the piece with the given code on square can move to, following ChessVar's rules.
+        Kings may list squares holding opponent pieces, which they cannot capture"""
+        board = self._board
+        color_bit = code & BLACK_BIT
+        piece = code & 7
+        moves = []
+        if piece == PAWN:
+            column, row = square & 7, square >> 3
+            if color_bit:
+                direction, start_row, pushes = -1, 6, _tables['black_pawn'][square]
+            else:
+                direction, start_row, pushes = 1, 1, _tables['white_pawn'][square]
+            if row == start_row and not board[square + 8 * direction] and not board[square + 16 * direction]:
+                moves.append(square + 16 * direction)
+            forward_row = row + direction
+            if 0 <= forward_row < 8:
+                for capture_column in (column + 1, column - 1):
+                    if 0 <= capture_column < 8:
+                        target = board[forward_row * 8 + capture_column]
+                        if target and target & BLACK_BIT != color_bit:
+                            moves.append(forward_row * 8 + capture_column)
+            moves.extend(target for target in pushes if not board[target])
+        elif piece == KNIGHT or piece == KING:
+            for target in _tables['knight' if piece == KNIGHT else 'king'][square]:
+                if not board[target] or board[target] & BLACK_BIT != color_bit:
+                    moves.append(target)
+        else:
+            ray_tables = (_tables['bishop'][square],) if piece == BISHOP else \
+                (_tables['rook'][square],) if piece == ROOK else (_tables['bishop'][square], _tables['rook'][square])
+            for rays in ray_tables:
+                for ray in rays:
+                    for target in ray:
+                        if not board[target]:
+                            moves.append(target)
+                            continue
+                        if board[target] & BLACK_BIT != color_bit:
+                            moves.append(target)
+                        break
+        return moves
+
+    def _generate_square_moves(self):
+        """Yields every legal move for the side to move as a pair of 0-63 squares"""
+        if self.get_game_state() != 'UNFINISHED':
+            return
+        board = self._board
+        color_bit = BLACK_BIT if self._turn == 'black' else 0
+        for square in range(64):
+            code = board[square]
+            if not code or code & BLACK_BIT != color_bit:
+                continue
+            for target in self._piece_moves(square, code):
+                # Kings cannot capture
+                if code & 7 == KING and board[target]:
+                    continue
+                yield square, target
+
+    def generate_moves(self):
+        """Yields every legal move for the side to move as a (square moved from, square moved to) pair in square
+        notation. The moves are the same as ChessVar.generate_moves gives, though not in the same order"""
+        for square_from, square_to in self._generate_square_moves():
+            yield _notation(square_from), _notation(square_to)
+
+    def _is_legal_square_move(self, square_from, square_to):
+        """Returns True if the side to move can move its piece from one square to the other. Does not check whether
+        the game has already been won"""
+        board = self._board
+        code = board[square_from]
+        if not code or (code & BLACK_BIT) != (BLACK_BIT if self._turn == 'black' else 0):
+            return False
+        if code & 7 == KING and board[square_to]:
+            return False
+        return square_to in self._piece_moves(square_from, code)
+
+    def is_legal(self, square_moved_from, square_moved_to):
+        """Returns True if make_move would accept the move from one square notation to the other"""
+        if self.get_game_state() != 'UNFINISHED':
+            return False
+        square_from = _parse_square(square_moved_from)
+        square_to = _parse_square(square_moved_to)
+        if square_from is None or square_to is None:
+            return False
+        return self._is_legal_square_move(square_from, square_to)
+
+    def make_move(self, square_moved_from, square_moved_to):
+        """Makes a move given in square notation, with the same rules and return value as ChessVar.make_move"""
+        if self.get_game_state() != 'UNFINISHED':
+            return False
+        square_from = _parse_square(square_moved_from)
+        square_to = _parse_square(square_moved_to)
+        if square_from is None or square_to is None or not self._is_legal_square_move(square_from, square_to):
+            return False
+        board = self._board
+        code = board[square_from]
+        board[square_from] = 0
+        if board[square_to]:
+            self._explode(square_to)
+        else:
+            board[square_to] = code
+            if code == KING:
+                self._white_king = square_to
+            elif code == KING | BLACK_BIT:
+                self._black_king = square_to
+        self._turn = 'black' if self._turn == 'white' else 'white'
+        if self._white_king == NO_KING and self._black_king == NO_KING:
+            return False
+        return True
+
+    def _explode(self, square):
+        """Removes the captured piece on square and every piece but pawns around it"""
+        board = self._board
+        self._remove(square)
+        for target in _tables['blast'][square]:
+            if board[target] and board[target] & 7 != PAWN:
+                self._remove(target)
+
+    def _remove(self, square):
+        """Empties a square, noting when a king is removed"""
+        code = self._board[square]
+        if code == KING:
+            self._white_king = NO_KING
+        elif code == KING | BLACK_BIT:
+            self._black_king = NO_KING
+        self._board[square] = 0
+
+    def print_board(self):
+        """Prints the board the way ChessVar.print_board does"""
+        rows = [[' '] * 8 for _ in range(8)]
+        for square, code in enumerate(self._board):
+            if code:
+                piece = _CODE_PIECES[code & 7]
+                letter = piece[1] if piece == 'knight' else piece[0]
+                rows[7 - (square >> 3)][square & 7] = letter if code & BLACK_BIT else letter.upper()
+        for row in rows:
+            print(' '.join(row))
+
+
+def _parse_square(square):
+    """Converts square notation such as 'e4' to a 0-63 square, or to None if it is off the board"""
+    column = ord(square[0]) - ord('a')
+    row = int(square[1]) - 1
+    if 0 <= column < 8 and 0 <= row < 8:
+        return row * 8 + column
+    return None
+
+
+def _notation(square):
+    """Converts a 0-63 square to square notation"""
+    return chr(ord('a') + (square & 7)) + str((square >> 3) + 1)
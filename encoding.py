@@ -0,0 +1,130 @@
+# Description: Compact binary encoding of Atomic Chess positions and moves. A position is 33 bytes: one nibble per
+# square from a1 to h8 in (column, row) order, two squares per byte with the lower-numbered square in the low nibble,
+# followed by one byte that is 1 when black is to move. A move is 16 bits: the from square in bits 0-5 and the to
+# square in bits 6-11, where square = row * 8 + column. Positions can be read straight out of a memoryview or mmap
+# without copying the buffer.
+
+import array
+import sys
+
+from ChessVar import ChessVar
+
+POSITION_SIZE = 33
+# Nibble of each piece; black pieces have bit 3 set as well, and 0 is an empty square
+PIECE_CODES = {'pawn': 1, 'knight': 2, 'bishop': 3, 'rook': 4, 'queen': 5, 'king': 6}
+BLACK_BIT = 8
+_CODE_PIECES = {code: piece for piece, code in PIECE_CODES.items()}
+# Square notation of every square index, such as 'e4' for 28, and the index of every square notation
+SQUARE_NAMES = tuple(chr(ord('a') + (square & 7)) + str((square >> 3) + 1) for square in range(64))
+SQUARE_INDEXES = {name: square for square, name in enumerate(SQUARE_NAMES)}
+
+
+def _byte_contents(byte):
+    """Returns the (square offset, is black, piece) tuples of the occupied nibbles of a board byte, or None if a
+    nibble holds no valid piece code"""
+    contents = []
+    for square_offset, code in ((0, byte & 15), (1, byte >> 4)):
+        if code:
+            piece = _CODE_PIECES.get(code & 7)
+            if piece is None:
+                return None
+            contents.append((square_offset, bool(code & BLACK_BIT), piece))
+    return tuple(contents)
+
+
+# Decoded contents of every possible board byte, so that decoding is one table lookup per pair of squares
+_BYTE_CONTENTS = [_byte_contents(byte) for byte in range(256)]
+
+
+def encode_position(game):
+    """Returns the 33-byte encoding of a game's position and side to move"""
+    data = bytearray(POSITION_SIZE)
+    for (column, row), piece in game._white_pieces.items():
+        square = row * 8 + column
+        data[square >> 1] |= PIECE_CODES[piece] << ((square & 1) * 4)
+    for (column, row), piece in game._black_pieces.items():
+        square = row * 8 + column
+        data[square >> 1] |= (PIECE_CODES[piece] | BLACK_BIT) << ((square & 1) * 4)
+    data[32] = 1 if game._turn == 'black' else 0
+    return bytes(data)
+
+
+def decode_position(buffer, offset=0):
+    """Creates a ChessVar from the 33-byte encoding starting at offset in a bytes object, bytearray, memoryview or
+    mmap. Only the bytes of that position are read. Raises ValueError if fewer than 33 bytes follow the offset or if
+    a square holds an invalid piece code"""
+    if len(buffer) - offset < POSITION_SIZE:
+        raise ValueError('a position is %d bytes, but only %d follow offset %d'
+                         % (POSITION_SIZE, max(len(buffer) - offset, 0), offset))
+    white_pieces = {}
+    black_pieces = {}
+    for index in range(32):
+        byte = buffer[offset + index]
+        if byte:
+            contents = _BYTE_CONTENTS[byte]
+            if contents is None:
+                raise ValueError('invalid piece code in byte %d of the position at offset %d' % (index, offset))
+            for square_offset, is_black, piece in contents:
+                square = index * 2 + square_offset
+                if is_black:
+                    black_pieces[(square & 7, square >> 3)] = piece
+                else:
+                    white_pieces[(square & 7, square >> 3)] = piece
+    turn = 'black' if buffer[offset + 32] else 'white'
+    return ChessVar.from_position(white_pieces, black_pieces, turn)
+
+
+def iter_positions(buffer):
+    """Yields a ChessVar for every position in a buffer of back-to-back 33-byte encodings, such as a memoryview of a
+    file opened with mmap. The buffer is indexed in place rather than copied"""
+    view = memoryview(buffer)
+    if view.ndim != 1 or view.itemsize != 1:
+        view = view.cast('B')
+    if len(view) % POSITION_SIZE:
+        raise ValueError('buffer length %d is not a multiple of %d' % (len(view), POSITION_SIZE))
+    for offset in range(0, len(view), POSITION_SIZE):
+        yield decode_position(view, offset)
+
+
+def write_positions(output, games):
+    """Writes the encodings of the given games back to back to a binary file and returns the number written"""
+    count = 0
+    for game in games:
+        output.write(encode_position(game))
+        count += 1
+    return count
+
+
+def encode_move(location_from, location_to):
+    """Packs a move between two (column, row) locations into a 16-bit integer"""
+    return (location_from[1] * 8 + location_from[0]) | (location_to[1] * 8 + location_to[0]) << 6
+
+
+def decode_move(move):
+    """Unpacks a 16-bit move into its (location moved from, location moved to) pair"""
+    square_from = move & 63
+    square_to = (move >> 6) & 63
+    return (square_from & 7, square_from >> 3), (square_to & 7, square_to >> 3)
+
+
+def encode_moves(moves):
+    """Packs a sequence of (square moved from, square moved to) pairs in square notation into bytes holding one
+    little-endian 16-bit move per move. Raises ValueError for a square off the board"""
+    try:
+        packed = array.array('H', (SQUARE_INDEXES[square_from] | SQUARE_INDEXES[square_to] << 6
+                                   for square_from, square_to in moves))
+    except KeyError as error:
+        raise ValueError('invalid square %s' % error) from None
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def decode_moves(buffer):
+    """Unpacks bytes of 16-bit moves, as written by encode_moves, into (square moved from, square moved to) pairs in
+    square notation"""
+    moves = array.array('H')
+    moves.frombytes(buffer)
+    if sys.byteorder == 'big':
+        moves.byteswap()
+    return [(SQUARE_NAMES[move & 63], SQUARE_NAMES[(move >> 6) & 63]) for move in moves]
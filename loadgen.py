@@ -0,0 +1,133 @@
+# Description: Load generator for the Atomic Chess game server. Many client connections each play several games of
+# random legal moves against a server, one request at a time per connection, and the run reports the moves per
+# second the server sustained and the percentiles of the move latency seen by the clients. Each client keeps its own
+# copy of its games to pick legal moves and to check the states the server returns.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from ChessVar import ChessVar
+
+
+async def _request(reader, writer, line):
+    """Sends one request line and returns the decoded response"""
+    writer.write(line.encode('ascii') + b'\n')
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def _client(host, port, games, max_moves, seed, latencies, errors):
+    """Opens one connection, starts games on it and plays random moves on them in turn until every game is over or
+    has reached max_moves. Appends the latency of every move to latencies and counts unexpected responses in
+    errors"""
+    generator = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        local_games = {}
+        for _ in range(games):
+            response = await _request(reader, writer, 'NEW')
+            local_games[response['game']] = ChessVar()
+        while local_games:
+            for game_id, game in list(local_games.items()):
+                moves = list(game.generate_moves())
+                if not moves or len(game._move_history) >= max_moves:
+                    await _request(reader, writer, 'CLOSE %d' % game_id)
+                    del local_games[game_id]
+                    continue
+                square_moved_from, square_moved_to = generator.choice(moves)
+                game.make_move(square_moved_from, square_moved_to)
+                start = time.perf_counter()
+                response = await _request(reader, writer, 'MOVE %d %s %s' % (game_id, square_moved_from,
+                                                                              square_moved_to))
+                latencies.append(time.perf_counter() - start)
+                if not response['ok'] or response['state'] != game.get_game_state():
+                    errors.append(response)
+    finally:
+        writer.close()
+
+
+def _percentile(sorted_values, fraction):
+    """Returns the value below which the given fraction of sorted values fall"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_load(host='127.0.0.1', port=8765, connections=50, games=4, max_moves=60, seed=0):
+    """Runs the clients concurrently and returns a dict with the number of moves, the elapsed seconds, the moves
+    per second, the p50, p99 and maximum move latency in seconds, and the number of unexpected responses"""
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, games, max_moves, seed + index, latencies, errors)
+                           for index in range(connections)))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'moves': len(latencies),
+        'seconds': seconds,
+        'moves_per_second': len(latencies) / seconds if seconds else 0.0,
+        'p50_latency': _percentile(latencies, 0.50),
+        'p99_latency': _percentile(latencies, 0.99),
+        'max_latency': latencies[-1] if latencies else 0.0,
+        'errors': len(errors),
+    }
+
+
+async def _wait_for_server(host, port, timeout=10.0):
+    """Waits until a server accepts connections on host and port"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+        else:
+            writer.close()
+            return
+
+
+def main():
+    """Runs the load generator from the command line and prints its report. With --spawn, a local server is started
+    for the run and stopped afterwards"""
+    parser = argparse.ArgumentParser(description='Load generator for the Atomic Chess game server')
+    parser.add_argument('--host', default='127.0.0.1', help='server address (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='server port (default 8765)')
+    parser.add_argument('--connections', type=int, default=50, help='concurrent connections (default 50)')
+    parser.add_argument('--games', type=int, default=4, help='games per connection (default 4)')
+    parser.add_argument('--moves', type=int, default=60, help='maximum moves per game (default 60)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--spawn', action='store_true', help='start a local server for the run')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    server = None
+    if args.spawn:
+        server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+        server = subprocess.Popen([sys.executable, server_script, '--host', args.host, '--port', str(args.port)])
+    try:
+        asyncio.run(_wait_for_server(args.host, args.port))
+        report = asyncio.run(run_load(args.host, args.port, args.connections, args.games, args.moves, args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print('%d moves in %.2fs: %.0f moves/s, latency p50 %.2fms, p99 %.2fms, max %.2fms, %d errors' % (
+            report['moves'], report['seconds'], report['moves_per_second'], report['p50_latency'] * 1000,
+            report['p99_latency'] * 1000, report['max_latency'] * 1000, report['errors']))
+    if report['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Description: Multi-process search for Atomic Chess. The root moves of a position are split into one share per
+# worker process, each worker searches its share with its own Searcher, and the best move over all shares is
+# returned as the same SearchResult a single-process search gives. Positions are sent to the workers in the 33-byte
+# encoding of ChessVar.to_bytes rather than as a pickled ChessVar.
+
+import concurrent.futures
+import os
+import time
+
+from ChessVar import ChessVar
+from search import Searcher, SearchResult
+
+# Searcher kept by each worker process between tasks, so that its transposition table survives from move to move
+_worker_searcher = None
+# Process pool kept between searches by get_search_executor, and its number of workers
+_search_executor = None
+_search_workers = None
+
+
+def _search_share(encoded_position, root_moves, depth, time_limit):
+    """Runs in a worker process: searches the given root moves of an encoded position and returns the SearchResult,
+    with the move as a pair of (column, row) locations so that the caller can match it to its own move list"""
+    global _worker_searcher
+    if _worker_searcher is None:
+        _worker_searcher = Searcher()
+    game = ChessVar.from_bytes(encoded_position)
+    result = _worker_searcher.search(game, depth, time_limit, root_moves)
+    if result.move is not None:
+        result = result._replace(move=(game.convert_square_to_location(result.move[0]),
+                                       game.convert_square_to_location(result.move[1])))
+    return result
+
+
+def get_search_executor(workers):
+    """Returns the process pool kept for searches with the given number of workers, starting it, or starting it again
+    with the new number of workers, when needed. ChessVar.best_move uses it so that only its first multi-process
+    search pays for starting the processes"""
+    global _search_executor, _search_workers
+    if _search_workers != workers:
+        shutdown_search_workers()
+        _search_executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        _search_workers = workers
+    return _search_executor
+
+
+def shutdown_search_workers():
+    """Stops the worker processes of the kept pool, if any are running. The next get_search_executor call starts
+    them again"""
+    global _search_executor, _search_workers
+    if _search_executor is not None:
+        _search_executor.shutdown()
+        _search_executor = None
+        _search_workers = None
+
+
+def parallel_best_move(game, depth=4, time_limit=None, workers=None, executor=None):
+    """Searches the game like ChessVar.best_move, but splits the root moves over several worker processes. Uses the
+    given ProcessPoolExecutor, or creates one for this call only, and splits the moves into the given number of shares
+    (one per CPU by default). Returns a SearchResult whose node count is the total over all workers. When a time limit
+    cuts the search short, the best moves of shares that completed different depths are compared as they are"""
+    start = time.perf_counter()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    root_moves = list(game._generate_location_moves())
+    if not root_moves:
+        return SearchResult(None, 0, 0, 0, time.perf_counter() - start)
+    # Deal the moves round-robin, so that every share gets a mix of early and late moves in generation order
+    shares = [root_moves[index::workers] for index in range(min(workers, len(root_moves)))]
+    encoded_position = game.to_bytes()
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=len(shares))
+    try:
+        futures = [executor.submit(_search_share, encoded_position, share, depth, time_limit) for share in shares]
+        results = [future.result() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+    best = max((result for result in results if result.move is not None), key=lambda result: result.score)
+    move = (game.convert_location_to_square(best.move[0]), game.convert_location_to_square(best.move[1]))
+    return SearchResult(move, best.score, best.depth, sum(result.nodes for result in results),
+                        time.perf_counter() - start)
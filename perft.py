@@ -0,0 +1,163 @@
+# Description: Perft for Atomic Chess. perft counts the leaf nodes of the tree of legal moves to a fixed depth, which
+# pins down the rules: any change to move generation, make_move or the explosion that alters the rules changes the
+# counts. The runner checks the counts of a suite of positions against known values and times each phase.
+
+import argparse
+import json
+import sys
+import time
+
+from ChessVar import ChessVar
+
+
+def perft(game, depth):
+    """Returns the number of leaf nodes reached by playing every sequence of depth legal moves from the game's
+    position. The game is searched in place and is left unchanged"""
+    if depth == 0:
+        return 1
+    moves = list(game._generate_location_moves())
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game._play_move(*move)
+        nodes += perft(game, depth - 1)
+        game.undo_move()
+    return nodes
+
+
+def timed_perft(game, depth):
+    """Runs perft while timing each phase separately. Returns a dict with the node count and the seconds spent in
+    move generation, in making moves (excluding explosions), in explosions and in undoing moves. The timers slow
+    the run down, so nodes per second should be measured with perft instead"""
+    timings = {'generation': 0.0, 'make': 0.0, 'explosion': 0.0, 'undo': 0.0}
+    clock = time.perf_counter
+    explosion_handler = game.explosion_handler
+
+    def timed_explosion_handler(location):
+        start = clock()
+        exploded_pieces = explosion_handler(location)
+        timings['explosion'] += clock() - start
+        return exploded_pieces
+
+    def walk(depth):
+        start = clock()
+        moves = list(game._generate_location_moves())
+        timings['generation'] += clock() - start
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            start = clock()
+            game._play_move(*move)
+            timings['make'] += clock() - start
+            nodes += walk(depth - 1)
+            start = clock()
+            game.undo_move()
+            timings['undo'] += clock() - start
+        return nodes
+
+    # Shadows the method on this game only, so that explosions triggered by _play_move are timed
+    game.explosion_handler = timed_explosion_handler
+    try:
+        nodes = walk(depth) if depth > 0 else 1
+    finally:
+        del game.explosion_handler
+    # Explosions happen inside _play_move, so their time is taken out of the make phase
+    timings['make'] -= timings['explosion']
+    timings['nodes'] = nodes
+    return timings
+
+
+def _position(white_pieces, black_pieces, turn='white'):
+    """Creates a game from dicts mapping square notations to piece names"""
+    game = ChessVar()
+    return ChessVar.from_position(
+        {game.convert_square_to_location(square): piece for square, piece in white_pieces.items()},
+        {game.convert_square_to_location(square): piece for square, piece in black_pieces.items()},
+        turn)
+
+
+def suite():
+    """Returns the perft suite as a list of (name, game, {depth: expected leaf nodes}) entries"""
+    return [
+        ('start', ChessVar(), {1: 12, 2: 144, 3: 2316, 4: 37318}),
+        # A knight and a bishop can capture next to the black king, and the black queen next to the white king
+        ('explosion next to kings', _position(
+            {'e1': 'king', 'g5': 'knight', 'c4': 'bishop', 'a1': 'rook', 'd2': 'pawn', 'e2': 'pawn'},
+            {'e8': 'king', 'f7': 'pawn', 'd7': 'knight', 'h4': 'queen', 'h8': 'rook', 'a7': 'pawn'}),
+         {1: 29, 2: 880, 3: 23845, 4: 755017}),
+        # Pieces directly in front of or two squares in front of pawns block their double steps
+        ('blocked double steps', _position(
+            {'e1': 'king', 'a2': 'pawn', 'b2': 'pawn', 'c2': 'pawn', 'd2': 'pawn', 'a3': 'knight', 'c4': 'bishop'},
+            {'e8': 'king', 'b3': 'knight', 'd4': 'pawn', 'e7': 'pawn', 'f7': 'pawn', 'e5': 'bishop', 'f6': 'rook'}),
+         {1: 18, 2: 450, 3: 7395, 4: 199023}),
+        # Capturing on e5 explodes both kings at once, so that neither side wins and make_move returns False
+        ('simultaneous king explosion', _position(
+            {'e4': 'king', 'c3': 'bishop', 'h5': 'rook', 'a2': 'pawn'},
+            {'e6': 'king', 'e5': 'knight', 'h8': 'rook', 'a7': 'pawn'}),
+         {1: 27, 2: 677, 3: 18364, 4: 459543}),
+    ]
+
+
+def run_suite(max_depth=3, check=True):
+    """Runs perft on every suite position up to max_depth, timing each run and its phases. Returns a list of result
+    dicts. With check, a count that differs from the known value is reported with 'ok' set to False"""
+    results = []
+    for name, game, expected in suite():
+        for depth in range(1, max_depth + 1):
+            start = time.perf_counter()
+            nodes = perft(game, depth)
+            seconds = time.perf_counter() - start
+            phases = timed_perft(game, depth)
+            result = {
+                'position': name,
+                'depth': depth,
+                'nodes': nodes,
+                'expected': expected.get(depth),
+                'seconds': seconds,
+                'nodes_per_second': nodes / seconds if seconds else 0.0,
+                'phases': {phase: phases[phase] for phase in ('generation', 'make', 'explosion', 'undo')},
+            }
+            result['ok'] = not check or result['expected'] is None or nodes == result['expected']
+            results.append(result)
+    return results
+
+
+def format_table(results):
+    """Formats suite results as a human-readable table"""
+    lines = ['%-28s %5s %10s %10s %9s %11s %8s %8s %9s %8s  %s' % (
+        'position', 'depth', 'nodes', 'expected', 'seconds', 'nodes/s', 'gen s', 'make s', 'explode s', 'undo s',
+        'status')]
+    for result in results:
+        phases = result['phases']
+        lines.append('%-28s %5d %10d %10s %9.3f %11.0f %8.3f %8.3f %9.3f %8.3f  %s' % (
+            result['position'], result['depth'], result['nodes'],
+            '-' if result['expected'] is None else result['expected'], result['seconds'],
+            result['nodes_per_second'], phases['generation'], phases['make'], phases['explosion'], phases['undo'],
+            'ok' if result['ok'] else 'MISMATCH'))
+    return '\n'.join(lines)
+
+
+def main():
+    """Runs the perft suite from the command line, prints the table, optionally writes JSON, and exits with status 1
+    if any node count differs from its known value"""
+    parser = argparse.ArgumentParser(description='Atomic Chess perft suite')
+    parser.add_argument('--depth', type=int, default=3, help='maximum depth to search (default 3)')
+    parser.add_argument('--json', metavar='FILE', help="write the results as JSON to FILE, or '-' for stdout")
+    args = parser.parse_args()
+    results = run_suite(args.depth)
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_table(results))
+        if args.json:
+            with open(args.json, 'w') as output:
+                json.dump(results, output, indent=2)
+    if not all(result['ok'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
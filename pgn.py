@@ -0,0 +1,239 @@
+# Description: Streaming import and export of Atomic Chess game records, in a PGN-like text form and in a form with
+# one game per line. Moves are written in coordinate notation, such as e2e4, which make_move takes directly once
+# split into its two squares. The readers are generators over the lines of a file, so files of any size are read one
+# game at a time; with lazy parsing a record keeps its move text unparsed until its moves are asked for. The writers
+# collect their output and write it in large blocks.
+#
+# PGN-like form: tag pairs such as [White "engine"] on their own lines, a blank line, then the move text, which may
+# hold move numbers ("1." or "1..."), {comments}, ; comments to the end of the line and a result token at the end.
+# Line form: the moves of a game separated by spaces, optionally followed by a result token.
+
+import re
+
+from ChessVar import ChessVar
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+# Result token written for each game state. A capture that destroys both kings leaves the state 'UNFINISHED'
+STATE_RESULTS = {'WHITE_WON': '1-0', 'BLACK_WON': '0-1', 'UNFINISHED': '*'}
+
+_TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# One token of move text: a move, optionally after its move number, a bare move number, a result, or anything else,
+# which is an error
+_TOKEN = re.compile(r'(?:\d+\.+)?([a-h][1-8])[-x]?([a-h][1-8])(?=\s|$)|\d+\.+(?=\s|$)'
+                    r'|(1-0|0-1|1/2-1/2|\*)(?=\s|$)|(\S+)')
+_COMMENT = re.compile(r'\{[^}]*\}|;[^\n]*')
+_COMMENT_START = re.compile(r'[{;]')
+_ESCAPE = re.compile(r'\\(.)')
+
+
+def parse_moves(movetext):
+    """Parses move text into a list of (square moved from, square moved to) pairs and the result token, or None if
+    there is none. Raises ValueError on a token that is neither a move, a move number nor a result"""
+    if '{' in movetext or ';' in movetext:
+        movetext = _COMMENT.sub(' ', movetext)
+    moves = []
+    result = None
+    for square_moved_from, square_moved_to, result_token, invalid in _TOKEN.findall(movetext):
+        if square_moved_from:
+            moves.append((square_moved_from, square_moved_to))
+        elif result_token:
+            result = result_token
+        elif invalid:
+            raise ValueError('invalid move %r' % invalid)
+    return moves, result
+
+
+class GameRecord:
+    """A game read from a record file: its tag pairs and its moves. With lazy parsing the move text is kept as read
+    and only parsed the first time moves or result is used, so that records can be filtered on their tags cheaply"""
+
+    __slots__ = ('tags', '_movetext', '_moves', '_result')
+
+    def __init__(self, tags, movetext, lazy=True):
+        """Creates a record from a dict of tag pairs and its move text, which is parsed now unless lazy is True"""
+        self.tags = tags
+        self._movetext = movetext
+        self._moves = None
+        self._result = None
+        if not lazy:
+            self._parse()
+
+    def _parse(self):
+        """Parses the move text, then drops it"""
+        self._moves, self._result = parse_moves(self._movetext)
+        self._movetext = None
+
+    @property
+    def moves(self):
+        """The moves as (square moved from, square moved to) pairs in square notation"""
+        if self._moves is None:
+            self._parse()
+        return self._moves
+
+    @property
+    def result(self):
+        """The result token of the move text, or else of the Result tag, or '*' if neither gives one"""
+        if self._moves is None:
+            self._parse()
+        return self._result or self.tags.get('Result', '*')
+
+    def play(self, game=None):
+        """Plays the moves with make_move on the given ChessVar, or on a new one, and returns the game. Raises
+        ValueError at the first move make_move rejects"""
+        if game is None:
+            game = ChessVar()
+        for index, (square_moved_from, square_moved_to) in enumerate(self.moves):
+            moves_played = len(game._move_history)
+            # make_move also returns False for a capture that destroys both kings, but that move is played
+            game.make_move(square_moved_from, square_moved_to)
+            if len(game._move_history) == moves_played:
+                raise ValueError('illegal move %d: %s%s' % (index + 1, square_moved_from, square_moved_to))
+        return game
+
+
+def _in_comment_after(line, in_comment):
+    """Returns True if a {comment} is still open at the end of a line of move text, given whether one was open at its
+    start. Braces after a ; comment are part of that comment"""
+    index = 0
+    while True:
+        if in_comment:
+            index = line.find('}', index)
+            if index < 0:
+                return True
+            index += 1
+            in_comment = False
+        else:
+            match = _COMMENT_START.search(line, index)
+            if match is None or match.group() == ';':
+                return False
+            index = match.end()
+            in_comment = True
+
+
+def read_pgn(lines, lazy=True):
+    """Yields a GameRecord for every game of a PGN-like file, read from any iterable of lines such as an open text
+    file. A game ends at a blank line after its move text, or where a tag pair follows its move text or follows a
+    blank line after its tags, so that a game with tags but no moves is a record of its own. Blank lines and tag pairs
+    inside a {comment} are part of the move text. Only the lines of the current game are held in memory"""
+    tags = {}
+    movetext = []
+    # Whether a blank line has ended the tags of a game that has no move text yet, and whether a comment is open
+    tags_ended = False
+    in_comment = False
+    for line in lines:
+        stripped = line.strip()
+        if in_comment:
+            movetext.append(stripped)
+            in_comment = _in_comment_after(stripped, True)
+        elif stripped.startswith('['):
+            if movetext or tags_ended:
+                # A tag after move text, or after a blank line, starts the next game
+                yield GameRecord(tags, '\n'.join(movetext), lazy)
+                tags, movetext, tags_ended = {}, [], False
+            match = _TAG.match(stripped)
+            if match is None:
+                raise ValueError('invalid tag pair %r' % stripped)
+            tags[match.group(1)] = _ESCAPE.sub(r'\1', match.group(2))
+        elif stripped:
+            movetext.append(stripped)
+            if '{' in stripped:
+                in_comment = _in_comment_after(stripped, False)
+        elif movetext:
+            yield GameRecord(tags, '\n'.join(movetext), lazy)
+            tags, movetext, tags_ended = {}, [], False
+        elif tags:
+            tags_ended = True
+    if tags or movetext:
+        yield GameRecord(tags, '\n'.join(movetext), lazy)
+
+
+def read_lines(lines, lazy=True):
+    """Yields a GameRecord, without tags, for every non-empty line of a file in the one-game-per-line form. Lines
+    starting with # are skipped"""
+    for line in lines:
+        stripped = line.strip()
+        if stripped and not stripped.startswith('#'):
+            yield GameRecord({}, stripped, lazy)
+
+
+def game_moves(game):
+    """Returns the moves played on a ChessVar, from its move history, as (square moved from, square moved to)
+    pairs"""
+    square = game.convert_location_to_square
+    return [(square(from_location), square(to_location)) for from_location, to_location, *_ in game._move_history]
+
+
+class _BufferedWriter:
+    """Collects text in memory and writes it to the stream once buffer_size characters have gathered"""
+
+    def __init__(self, stream, buffer_size=1 << 16):
+        """Writes to an open text stream, buffering up to buffer_size characters"""
+        self._stream = stream
+        self._buffer_size = buffer_size
+        self._buffer = []
+        self._buffered = 0
+        self.games_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def _write(self, text):
+        """Adds text to the buffer, writing the buffer out when it is full"""
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Writes out everything buffered"""
+        if self._buffer:
+            self._stream.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def write_chessvar(self, game, tags=None):
+        """Writes the moves played on a ChessVar, with the result of its current state"""
+        self.write_game(game_moves(game), STATE_RESULTS[game.get_game_state()], tags)
+
+
+class PGNWriter(_BufferedWriter):
+    """Writes games in the PGN-like form, with move numbers and the move text wrapped to 80 columns"""
+
+    def write_game(self, moves, result='*', tags=None):
+        """Writes a game from its (square moved from, square moved to) pairs, result token and optional tag pairs.
+        The Result tag is set from result unless tags give one"""
+        tags = dict(tags or {})
+        tags.setdefault('Result', result)
+        parts = ['[%s "%s"]\n' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                 for name, value in tags.items()]
+        parts.append('\n')
+        line = ''
+        tokens = []
+        for index, (square_moved_from, square_moved_to) in enumerate(moves):
+            if index % 2 == 0:
+                tokens.append('%d.' % (index // 2 + 1))
+            tokens.append(square_moved_from + square_moved_to)
+        tokens.append(result)
+        for token in tokens:
+            if line and len(line) + 1 + len(token) > 80:
+                parts.append(line + '\n')
+                line = token
+            else:
+                line = line + ' ' + token if line else token
+        parts.append(line + '\n\n')
+        self._write(''.join(parts))
+        self.games_written += 1
+
+
+class LineWriter(_BufferedWriter):
+    """Writes games in the one-game-per-line form. Tags cannot be written in this form and are ignored"""
+
+    def write_game(self, moves, result='*', tags=None):
+        """Writes a game from its (square moved from, square moved to) pairs and result token"""
+        tokens = [square_moved_from + square_moved_to for square_moved_from, square_moved_to in moves]
+        tokens.append(result)
+        self._write(' '.join(tokens) + '\n')
+        self.games_written += 1
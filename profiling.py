@@ -0,0 +1,106 @@
+# Description: Optional instrumentation of the ChessVar hot paths. A Profiler counts the calls to make_move,
+# get_game_state, explosion_handler and each get_*_possible_moves method, and accumulates the time spent in them, by
+# replacing those methods with timing wrappers on the ChessVar class or on a single game. Disabling it puts the
+# original methods back, so that a disabled profiler costs nothing at all. Results are exported as a dict or as
+# Prometheus text.
+
+import functools
+import time
+
+INSTRUMENTED_METHODS = (
+    'make_move',
+    'get_game_state',
+    'explosion_handler',
+    'get_pawn_possible_moves',
+    'get_knight_possible_moves',
+    'get_bishop_possible_moves',
+    'get_rook_possible_moves',
+    'get_queen_possible_moves',
+    'get_king_possible_moves',
+)
+
+# Marks a method that was inherited rather than defined on the instrumented target
+_INHERITED = object()
+
+
+class Profiler:
+    """Call counters and cumulative timings of the instrumented ChessVar methods. Timings are inclusive: time spent
+    in get_queen_possible_moves is also counted in the bishop and rook methods it calls, and time spent in make_move
+    includes the game-state checks and explosions it triggers"""
+
+    def __init__(self):
+        """Creates a disabled profiler with every counter at zero"""
+        self._calls = dict.fromkeys(INSTRUMENTED_METHODS, 0)
+        self._seconds = dict.fromkeys(INSTRUMENTED_METHODS, 0.0)
+        # Target the wrappers are installed on, and the attributes they replaced
+        self._target = None
+        self._replaced = {}
+
+    @property
+    def enabled(self):
+        """True while the wrappers are installed"""
+        return self._target is not None
+
+    def _wrap(self, name, method):
+        """Returns a wrapper of method that counts and times its calls under name"""
+        calls = self._calls
+        seconds = self._seconds
+        clock = time.perf_counter
+
+        @functools.wraps(method)
+        def timed_method(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds[name] += clock() - start
+                calls[name] += 1
+        return timed_method
+
+    def enable(self, target):
+        """Starts profiling the ChessVar class, or a subclass, which covers every game, or a single game. Does nothing
+        if the profiler is already enabled on the same target. Raises ValueError if it is enabled on another one"""
+        if self._target is target:
+            return
+        if self._target is not None:
+            raise ValueError('the profiler is already enabled on another target')
+        for name in INSTRUMENTED_METHODS:
+            self._replaced[name] = vars(target).get(name, _INHERITED)
+            # On a class, the plain function is wrapped and becomes a method again; on a game, the bound method is
+            setattr(target, name, self._wrap(name, getattr(target, name)))
+        self._target = target
+
+    def disable(self):
+        """Stops profiling and restores the original methods. The counters are kept"""
+        if self._target is None:
+            return
+        for name, replaced in self._replaced.items():
+            if replaced is _INHERITED:
+                delattr(self._target, name)
+            else:
+                setattr(self._target, name, replaced)
+        self._target = None
+        self._replaced = {}
+
+    def reset(self):
+        """Sets every counter back to zero"""
+        for name in INSTRUMENTED_METHODS:
+            self._calls[name] = 0
+            self._seconds[name] = 0.0
+
+    def as_dict(self):
+        """Returns a dict mapping each instrumented method to a dict of its number of calls and cumulative seconds"""
+        return {name: {'calls': self._calls[name], 'seconds': self._seconds[name]} for name in INSTRUMENTED_METHODS}
+
+    def to_prometheus(self, prefix='chessvar'):
+        """Returns the counters in the Prometheus text exposition format, as two counter families labelled by
+        method"""
+        lines = ['# HELP %s_calls_total Number of calls to each ChessVar method.' % prefix,
+                 '# TYPE %s_calls_total counter' % prefix]
+        lines.extend('%s_calls_total{method="%s"} %d' % (prefix, name, self._calls[name])
+                     for name in INSTRUMENTED_METHODS)
+        lines.extend(['# HELP %s_seconds_total Cumulative seconds spent in each ChessVar method.' % prefix,
+                      '# TYPE %s_seconds_total counter' % prefix])
+        lines.extend('%s_seconds_total{method="%s"} %r' % (prefix, name, self._seconds[name])
+                     for name in INSTRUMENTED_METHODS)
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,93 @@
+# Description: Bulk replay of archived Atomic Chess games. Games are streamed one at a time through a single reused
+# ChessVar, squares are parsed through a lookup table built once, and a result is yielded per game, so memory stays
+# flat however many games are replayed. A multi-process mode replays chunks of games in worker processes.
+
+import collections
+import concurrent.futures
+import itertools
+
+from ChessVar import ChessVar
+
+ReplayResult = collections.namedtuple('ReplayResult', ['state', 'first_illegal_move', 'explosions', 'moves_played'])
+ReplayResult.__doc__ = """The outcome of replaying one game: the game state after the last legal move, the index of
+the first move make_move would have rejected (None if every move was legal; the moves after it are not replayed),
+the number of captures, each of which set off an explosion, and the number of moves played. A capture that destroys
+both kings is played and is not reported as illegal, although make_move returns False for it; the state then stays
+'UNFINISHED'"""
+
+# (column, row) location of every square notation on the board, so that replays skip parsing strings
+_SQUARE_LOCATIONS = {chr(ord('a') + column) + str(row + 1): (column, row) for column in range(8) for row in range(8)}
+
+# Game reused by the tasks run in each worker process, as returned by worker_game
+_worker_game = None
+
+
+def _split_move(move):
+    """Returns the (square moved from, square moved to) pair of a move given as a pair or as a string like 'e2e4'"""
+    if isinstance(move, str):
+        return move[:2], move[2:]
+    return move
+
+
+def replay_game(game, moves):
+    """Resets the game, plays the moves on it and returns a ReplayResult. Moves are (from, to) pairs or strings like
+    'e2e4' in square notation. Replaying stops at the first move make_move would reject"""
+    game.reset()
+    square_locations = _SQUARE_LOCATIONS
+    history = game._move_history
+    explosions = 0
+    for index, move in enumerate(moves):
+        square_from, square_to = _split_move(move)
+        from_location = square_locations.get(square_from)
+        to_location = square_locations.get(square_to)
+        if from_location is None or to_location is None or game.get_game_state() != 'UNFINISHED' or \
+                not game._is_legal_location_move(from_location, to_location):
+            return ReplayResult(game.get_game_state(), index, explosions, len(history))
+        game._play_move(from_location, to_location)
+        # The capturing piece does not survive a capture, so a captured piece means an explosion
+        if history[-1][3] is not None:
+            explosions += 1
+    return ReplayResult(game.get_game_state(), None, explosions, len(history))
+
+
+def worker_game():
+    """Returns the ChessVar reused by every task run in the current worker process, creating it on first use"""
+    global _worker_game
+    if _worker_game is None:
+        _worker_game = ChessVar()
+    return _worker_game
+
+
+def run_chunks(function, chunks, workers, *args):
+    """Calls function(chunk, *args) for every chunk of an iterable in that many worker processes, and yields the
+    items of the lists it returns, in the order of the chunks. At most two chunks per worker are in flight at any
+    time, so the chunks are consumed lazily and the workers are kept busy without reading more input than needed"""
+    chunks = iter(chunks)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        while True:
+            for chunk in itertools.islice(chunks, 2 * workers - len(pending)):
+                pending.append(executor.submit(function, chunk, *args))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def _replay_chunk(chunk):
+    """Runs in a worker process: replays a list of games on the worker's game and returns their results"""
+    game = worker_game()
+    return [replay_game(game, moves) for moves in chunk]
+
+
+def replay_games(games, workers=None, chunk_size=1000):
+    """Replays every game of an iterable of move lists and yields a ReplayResult for each, in order. The iterable is
+    consumed lazily, so it can be a generator reading a large archive. With workers, chunks of chunk_size games are
+    replayed in that many processes, and at most two chunks per worker are in flight at any time"""
+    if not workers:
+        game = ChessVar()
+        for moves in games:
+            yield replay_game(game, moves)
+        return
+    games = iter(games)
+    chunks = iter(lambda: list(itertools.islice(games, chunk_size)), [])
+    yield from run_chunks(_replay_chunk, chunks, workers)
@@ -0,0 +1,293 @@
+# Description: Alpha-beta search engine for Atomic Chess. It searches a ChessVar game in place, making moves with
+# _play_move and taking them back with undo_move, and deepens iteratively until a depth or time limit is reached.
+# Positions are cached by their Zobrist hash in a bounded transposition table.
+
+import collections
+import time
+
+from ChessVar import ChessVar
+
+# Material value of each piece, in hundredths of a pawn
+PIECE_VALUES = ChessVar._piece_values
+# Score of a won game. Wins found closer to the root score higher, so the engine prefers the fastest win
+WIN_SCORE = 100000
+# Penalty per non-pawn piece standing next to its own king, since capturing it also explodes the king
+KING_NEIGHBOUR_PENALTY = 40
+
+EXACT, LOWER_BOUND, UPPER_BOUND = range(3)
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time limit is reached, to unwind back to the root"""
+
+
+SearchResult = collections.namedtuple('SearchResult', ['move', 'score', 'depth', 'nodes', 'seconds'])
+SearchResult.__doc__ = """The outcome of a search: the best move as a (square moved from, square moved to) pair in
+square notation, or None if there is no legal move, its score for the side to move in hundredths of a pawn, the
+deepest completed depth, the number of nodes searched and the seconds spent"""
+SearchResult.nodes_per_second = property(lambda self: self.nodes / self.seconds if self.seconds else 0.0)
+
+
+class TranspositionTable:
+    """A bounded cache of search results keyed by position hash. Each entry holds the depth searched, the score,
+    whether the score is exact or a bound, and the best move found. A deeper result for a position replaces a
+    shallower one, and when the table is full the oldest entry is evicted to make room"""
+
+    def __init__(self, max_entries=1 << 18):
+        """Creates an empty table holding at most max_entries positions"""
+        self._max_entries = max_entries
+        self._entries = {}
+
+    def __len__(self):
+        """Returns the number of positions in the table"""
+        return len(self._entries)
+
+    def get(self, position_hash):
+        """Returns the (depth, score, bound, move) entry for a position hash, or None if there is none"""
+        return self._entries.get(position_hash)
+
+    def store(self, position_hash, depth, score, bound, move):
+        """Stores a search result, unless the table already holds a deeper result for the position"""
+        entries = self._entries
+        entry = entries.get(position_hash)
+        if entry is not None:
+            if entry[0] > depth:
+                return
+            # Re-inserting moves the entry to the back of the eviction order
+            del entries[position_hash]
+        elif len(entries) >= self._max_entries:
+            del entries[next(iter(entries))]
+        entries[position_hash] = (depth, score, bound, move)
+
+    def clear(self):
+        """Removes every entry from the table"""
+        self._entries.clear()
+
+
+def _kings_alive(game):
+    """Returns a (white has king, black has king) pair"""
+    return game._white_king is not None, game._black_king is not None
+
+
+def _explosion_gain(game, from_location, to_location, ally_pieces, opponent_pieces):
+    """Returns the material the opponent loses minus the material the side to move loses if the piece on
+    from_location captures on to_location, or None if the move is not a capture. Exploding the opponent king counts
+    as a win and exploding one's own king as a loss"""
+    captured_piece = opponent_pieces.get(to_location)
+    if captured_piece is None:
+        return None
+    gain = PIECE_VALUES[captured_piece] - PIECE_VALUES[ally_pieces[from_location]]
+    if captured_piece == 'king':
+        gain += WIN_SCORE
+    for location in game._blast_squares[to_location]:
+        piece = opponent_pieces.get(location)
+        if piece is not None and piece != 'pawn':
+            gain += WIN_SCORE if piece == 'king' else PIECE_VALUES[piece]
+            continue
+        piece = ally_pieces.get(location)
+        if piece is not None and piece != 'pawn' and location != from_location:
+            gain -= WIN_SCORE if piece == 'king' else PIECE_VALUES[piece]
+    return gain
+
+
+def evaluate(game):
+    """Returns a static score of the position for the side to move, in hundredths of a pawn. It counts material and
+    penalizes non-pawn pieces standing next to their own king, since a capture on any of them explodes the king and
+    the king cannot capture its attacker. Captures that explode a king are left to the search, which scores them as
+    wins"""
+    # Material and king locations are tracked by the game as moves are made
+    if game._turn == 'white':
+        ally_pieces, opponent_pieces = game._white_pieces, game._black_pieces
+        ally_king, opponent_king = game._white_king, game._black_king
+        score = game._white_material - game._black_material
+    else:
+        ally_pieces, opponent_pieces = game._black_pieces, game._white_pieces
+        ally_king, opponent_king = game._black_king, game._white_king
+        score = game._black_material - game._white_material
+    if ally_king is not None:
+        for location in game._blast_squares[ally_king]:
+            if ally_pieces.get(location, 'pawn') != 'pawn':
+                score -= KING_NEIGHBOUR_PENALTY
+    if opponent_king is not None:
+        for location in game._blast_squares[opponent_king]:
+            if opponent_pieces.get(location, 'pawn') != 'pawn':
+                score += KING_NEIGHBOUR_PENALTY
+    return score
+
+
+class Searcher:
+    """Iterative-deepening alpha-beta search over a ChessVar game. The game is searched in place and is left in its
+    original position when the search returns. Keeping one Searcher between moves reuses its transposition table"""
+
+    def __init__(self, table_size=1 << 18, quiescence_depth=4):
+        """Creates a searcher with a transposition table of table_size entries. Captures are searched up to
+        quiescence_depth plies past the nominal depth so that leaves are not evaluated in the middle of an exchange"""
+        self.table = TranspositionTable(table_size)
+        self._quiescence_depth = quiescence_depth
+        self._nodes = 0
+        self._deadline = None
+
+    def search(self, game, depth=4, time_limit=None, root_moves=None):
+        """Searches the game to the given depth, stopping early once time_limit seconds have passed, and returns a
+        SearchResult for the deepest iteration that completed. If root_moves is given, as a list of pairs of
+        (column, row) locations, only those moves are considered at the root"""
+        start = time.perf_counter()
+        self._nodes = 0
+        self._deadline = start + time_limit if time_limit is not None else None
+        best_move, best_score, completed_depth = None, 0, 0
+        for current_depth in range(1, depth + 1):
+            try:
+                score, move = self._search_root(game, current_depth, root_moves)
+            except SearchTimeout:
+                break
+            completed_depth = current_depth
+            if move is not None:
+                best_move, best_score = move, score
+            # A forced win or loss will not change with more depth
+            if move is None or abs(score) >= WIN_SCORE - 1000:
+                break
+        if best_move is None and completed_depth == 0:
+            # Not even depth one finished in time, so fall back to the first legal move
+            best_move = next(iter(root_moves or game._generate_location_moves()), None)
+        seconds = time.perf_counter() - start
+        if best_move is not None:
+            best_move = (game.convert_location_to_square(best_move[0]), game.convert_location_to_square(best_move[1]))
+        return SearchResult(best_move, best_score, completed_depth, self._nodes, seconds)
+
+    def _search_root(self, game, depth, root_moves=None):
+        """Searches every root move, or only the given root moves, to the given depth and returns a (score, move)
+        pair for the best one"""
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_score, best_move = -WIN_SCORE - 1, None
+        moves = self._ordered_moves(game, self.table.get(game.get_position_hash()))
+        if root_moves is not None:
+            moves = [move for move in moves if move in root_moves]
+        for move in moves:
+            game._play_move(*move)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, 1)
+            finally:
+                game.undo_move()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+        # The best of a subset of the root moves is not the best move of the position, so it is not cached
+        if best_move is not None and root_moves is None:
+            self.table.store(game.get_position_hash(), depth, best_score, EXACT, best_move)
+        return best_score, best_move
+
+    def _terminal_score(self, game, ply):
+        """Returns the score for the side to move if the game has ended, or None if it has not"""
+        white_has_king, black_has_king = _kings_alive(game)
+        if white_has_king and black_has_king:
+            return None
+        if not white_has_king and not black_has_king:
+            return 0
+        # The side to move has lost if its own king is the one that exploded
+        side_has_king = white_has_king if game._turn == 'white' else black_has_king
+        return WIN_SCORE - ply if side_has_king else -(WIN_SCORE - ply)
+
+    def _tick(self):
+        """Counts a node and checks the time limit every few thousand nodes"""
+        self._nodes += 1
+        if self._deadline is not None and not self._nodes & 2047 and time.perf_counter() > self._deadline:
+            raise SearchTimeout
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        """Returns the score of the position for the side to move, searched to the given depth within the
+        (alpha, beta) window"""
+        self._tick()
+        terminal_score = self._terminal_score(game, ply)
+        if terminal_score is not None:
+            return terminal_score
+        if depth <= 0:
+            return self._quiescence(game, alpha, beta, ply, self._quiescence_depth)
+
+        position_hash = game.get_position_hash()
+        entry = self.table.get(position_hash)
+        if entry is not None and entry[0] >= depth:
+            _, score, bound, _ = entry
+            if bound == EXACT:
+                return score
+            if bound == LOWER_BOUND and score >= beta:
+                return score
+            if bound == UPPER_BOUND and score <= alpha:
+                return score
+
+        original_alpha = alpha
+        best_score, best_move = -WIN_SCORE - 1, None
+        for move in self._ordered_moves(game, entry):
+            game._play_move(*move)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo_move()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if best_move is None:
+            # The side to move has no legal move
+            return 0
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.store(position_hash, depth, best_score, bound, best_move)
+        return best_score
+
+    def _quiescence(self, game, alpha, beta, ply, depth):
+        """Searches only winning captures until the position is quiet, so that the static evaluation is not taken in
+        the middle of a chain of explosions. Captures that explode the opponent king are always searched"""
+        stand_pat = evaluate(game)
+        if depth <= 0 or stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        for move in self._ordered_moves(game, None, captures_only=True):
+            game._play_move(*move)
+            try:
+                self._tick()
+                terminal_score = self._terminal_score(game, ply + 1)
+                if terminal_score is not None:
+                    score = -terminal_score
+                else:
+                    score = -self._quiescence(game, -beta, -alpha, ply + 1, depth - 1)
+            finally:
+                game.undo_move()
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
+
+    def _ordered_moves(self, game, entry, captures_only=False):
+        """Returns the legal moves of the side to move, best candidates first: the move stored in the
+        transposition table, then captures by how much more material they explode on the opponent's side than on
+        ours, then quiet moves. With captures_only, returns only the captures that gain material"""
+        if game._turn == 'white':
+            ally_pieces, opponent_pieces = game._white_pieces, game._black_pieces
+        else:
+            ally_pieces, opponent_pieces = game._black_pieces, game._white_pieces
+        table_move = entry[3] if entry is not None else None
+        first = []
+        captures = []
+        quiet_moves = []
+        for move in game._generate_location_moves():
+            gain = _explosion_gain(game, move[0], move[1], ally_pieces, opponent_pieces)
+            if captures_only:
+                if gain is not None and gain > 0:
+                    captures.append((gain, move))
+            elif move == table_move:
+                first.append(move)
+            elif gain is not None:
+                captures.append((gain, move))
+            else:
+                quiet_moves.append(move)
+        captures.sort(key=lambda capture: capture[0], reverse=True)
+        return first + [move for _, move in captures] + quiet_moves
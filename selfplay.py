@@ -0,0 +1,186 @@
+# Description: Self-play for Atomic Chess. Complete games are played by a random, greedy or shallow-search policy
+# choosing among the legal moves of a ChessVar, so no move attempt is ever wasted, and are written out as a compact
+# stream of 16-bit moves. Game i of a run is played with seed + i whichever process plays it, so a run gives the same
+# games with any number of worker processes.
+#
+# Stream format, repeated for every game: a record header with the number of moves and the result code, followed by
+# that many little-endian 16-bit moves as packed by encoding.encode_moves.
+
+import argparse
+import collections
+import os
+import random
+import struct
+import time
+
+from ChessVar import ChessVar
+from encoding import decode_moves, encode_moves
+from replay import run_chunks, worker_game
+from search import Searcher, _explosion_gain
+
+POLICIES = ('random', 'greedy', 'search')
+# Number of moves and result code
+GAME_HEADER = struct.Struct('<HB')
+MOVE = struct.Struct('<H')
+# Results as stored in the stream. A capture that destroys both kings ends the game with neither side winning, which
+# get_game_state reports as 'UNFINISHED', like a game cut off at max_plies
+RESULT_CODES = {'UNFINISHED': 0, 'WHITE_WON': 1, 'BLACK_WON': 2}
+_CODE_RESULTS = {code: result for result, code in RESULT_CODES.items()}
+
+SelfPlayGame = collections.namedtuple('SelfPlayGame', ['seed', 'moves', 'state'])
+SelfPlayGame.__doc__ = """A self-play game: the seed it was played with, its moves as (square moved from, square
+moved to) pairs in square notation, and the final game state"""
+
+
+def _choose_move(game, moves, policy, generator, depth):
+    """Returns the move the policy plays among the legal (location, location) moves of the game"""
+    if policy == 'random':
+        return generator.choice(moves)
+    if policy == 'greedy':
+        # Plays the capture that wins the most material, or a random move if no capture gains anything
+        if game._turn == 'white':
+            ally_pieces, opponent_pieces = game._white_pieces, game._black_pieces
+        else:
+            ally_pieces, opponent_pieces = game._black_pieces, game._white_pieces
+        best_gain, best_moves = 0, []
+        for move in moves:
+            gain = _explosion_gain(game, move[0], move[1], ally_pieces, opponent_pieces) or 0
+            if gain > best_gain:
+                best_gain, best_moves = gain, [move]
+            elif gain == best_gain:
+                best_moves.append(move)
+        return generator.choice(best_moves)
+    # A fresh table per search, so that the move does not depend on the games searched before in the same process
+    result = Searcher(table_size=1 << 14).search(game, depth)
+    return game.convert_square_to_location(result.move[0]), game.convert_square_to_location(result.move[1])
+
+
+def random_walk(seed, max_plies=200):
+    """Plays random moves from the starting position with the given seed and yields a (game, move) pair after each
+    one, with the move as a pair of (column, row) locations. The same ChessVar is yielded every time, so callers copy
+    it to keep a position. The walk stops when the side to move has no move or after max_plies moves. Tests and
+    benchmarks use it to visit many varied positions cheaply"""
+    generator = random.Random(seed)
+    game = ChessVar()
+    for _ in range(max_plies):
+        moves = list(game._generate_location_moves())
+        if not moves:
+            return
+        move = generator.choice(moves)
+        game._play_move(*move)
+        yield game, move
+
+
+def play_game(seed, policy='random', max_plies=200, depth=2, random_plies=4, game=None):
+    """Plays one game from the starting position and returns a SelfPlayGame. Every move is chosen by the policy,
+    except the first random_plies moves of the search policy, which are random so that its games differ. The game
+    ends when a king is destroyed or after max_plies moves. A ChessVar to reuse can be passed as game"""
+    if policy not in POLICIES:
+        raise ValueError('unknown policy %r' % policy)
+    if game is None:
+        game = ChessVar()
+    else:
+        game.reset()
+    generator = random.Random(seed)
+    moves = []
+    # An unfinished game without a white king is one where a capture destroyed both kings
+    while len(moves) < max_plies and game.get_game_state() == 'UNFINISHED' and game._white_king is not None:
+        legal_moves = list(game._generate_location_moves())
+        if not legal_moves:
+            break
+        move_policy = 'random' if policy == 'search' and len(moves) < random_plies else policy
+        move = _choose_move(game, legal_moves, move_policy, generator, depth)
+        game._play_move(*move)
+        moves.append(move)
+    square = game.convert_location_to_square
+    return SelfPlayGame(seed, [(square(square_from), square(square_to)) for square_from, square_to in moves],
+                        game.get_game_state())
+
+
+def _play_chunk(seeds, policy, max_plies, depth, random_plies):
+    """Runs in a worker process: plays a game per seed on the worker's game and returns them"""
+    game = worker_game()
+    return [play_game(seed, policy, max_plies, depth, random_plies, game) for seed in seeds]
+
+
+def generate_games(count, policy='random', seed=0, workers=None, chunk_size=50, max_plies=200, depth=2,
+                   random_plies=4):
+    """Plays count games with seeds seed, seed + 1, ... and yields them in order. With workers, chunks of chunk_size
+    games are played in that many processes, with at most two chunks per worker in flight at any time. The games
+    are the same with or without workers"""
+    seeds = range(seed, seed + count)
+    if not workers:
+        game = ChessVar()
+        for game_seed in seeds:
+            yield play_game(game_seed, policy, max_plies, depth, random_plies, game)
+        return
+    chunks = (seeds[start:start + chunk_size] for start in range(0, count, chunk_size))
+    yield from run_chunks(_play_chunk, chunks, workers, policy, max_plies, depth, random_plies)
+
+
+def write_games(output, games):
+    """Writes games to a binary file as a move stream and returns the number written"""
+    count = 0
+    for selfplay_game in games:
+        output.write(GAME_HEADER.pack(len(selfplay_game.moves), RESULT_CODES[selfplay_game.state]))
+        output.write(encode_moves(selfplay_game.moves))
+        count += 1
+    return count
+
+
+def read_games(stream):
+    """Yields a (moves, state) pair for every game of a binary move stream, with the moves as (square moved from,
+    square moved to) pairs in square notation. The moves can be passed straight to replay.replay_games"""
+    while True:
+        header = stream.read(GAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < GAME_HEADER.size:
+            raise ValueError('truncated game header')
+        move_count, result_code = GAME_HEADER.unpack(header)
+        data = stream.read(move_count * MOVE.size)
+        if len(data) < move_count * MOVE.size or result_code not in _CODE_RESULTS:
+            raise ValueError('truncated or corrupt game record')
+        yield decode_moves(data), _CODE_RESULTS[result_code]
+
+
+def main():
+    """Generates self-play games from the command line, optionally writes them to a file, and prints the throughput
+    and the results"""
+    parser = argparse.ArgumentParser(description='Atomic Chess self-play')
+    parser.add_argument('--games', type=int, default=1000, help='number of games (default 1000)')
+    parser.add_argument('--policy', choices=POLICIES, default='random', help='move policy (default random)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game (default 0)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes (default one per CPU; 0 plays in this process)')
+    parser.add_argument('--depth', type=int, default=2, help='search depth of the search policy (default 2)')
+    parser.add_argument('--max-plies', type=int, default=200, help='maximum moves per game (default 200)')
+    parser.add_argument('--output', metavar='FILE', help='write the games as a move stream to FILE')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    games = generate_games(args.games, args.policy, args.seed, args.workers, max_plies=args.max_plies,
+                           depth=args.depth)
+    results = collections.Counter()
+    plies = 0
+
+    def counted(games):
+        nonlocal plies
+        for game in games:
+            results[game.state] += 1
+            plies += len(game.moves)
+            yield game
+
+    if args.output:
+        with open(args.output, 'wb') as output:
+            write_games(output, counted(games))
+    else:
+        for _ in counted(games):
+            pass
+    seconds = time.perf_counter() - start
+    print('%d games, %d moves in %.2fs: %.1f games/s, %.0f moves/s' % (
+        args.games, plies, seconds, args.games / seconds, plies / seconds))
+    print(', '.join('%s %d' % (state, results[state]) for state in sorted(results)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# Description: Asyncio game server for Atomic Chess. Many games are multiplexed over one event loop and driven through a
+# line protocol over TCP: each request is one line of whitespace-separated words and each response is one line of
+# JSON. Moves are cheap and are played on the loop, while engine replies are searched in a process pool so that they
+# never block it. Games left idle are packed into their 33-byte encoding until their next request.
+#
+# Requests:
+#   NEW                     starts a game
+#   MOVE <game> <from> <to> plays a move given in square notation, such as MOVE 1 e2 e4
+#   ENGINE <game> [depth]   lets the engine play the side to move
+#   BOARD <game>            returns the whole board
+#   CLOSE <game>            ends a game and frees it
+# Every response holds "ok" and, on failure, "error". Moves answer with the game state, the side to move and a "diff"
+# mapping each square that changed to its new piece, or null when the square was emptied.
+
+import argparse
+import asyncio
+import concurrent.futures
+import concurrent.futures.process
+import itertools
+import json
+import re
+import time
+
+from ChessVar import ChessVar
+from parallel_search import _search_share
+
+# A square in the notation make_move takes, such as e4
+_SQUARE = re.compile(r'[a-h][1-8]')
+
+
+def _symbol(color, piece):
+    """Returns the letter print_board shows for a piece: uppercase for white, lowercase for black, N for knights"""
+    letter = 'n' if piece == 'knight' else piece[0]
+    return letter.upper() if color == 'white' else letter
+
+
+def _board(game):
+    """Returns a dict mapping the square of every piece of a game to its letter"""
+    board = {}
+    for color, pieces in (('white', game._white_pieces), ('black', game._black_pieces)):
+        for location, piece in pieces.items():
+            board[game.convert_location_to_square(location)] = _symbol(color, piece)
+    return board
+
+
+def _last_move_diff(game):
+    """Returns the squares changed by the last move of a game, mapped to their new letter or to None"""
+    from_location, to_location, from_piece, captured_piece, exploded_pieces, _ = game._move_history[-1]
+    square = game.convert_location_to_square
+    # The turn has already passed to the other side
+    mover = 'black' if game._turn == 'white' else 'white'
+    diff = {square(from_location): None}
+    diff[square(to_location)] = None if captured_piece is not None else _symbol(mover, from_piece)
+    for _, location, _ in exploded_pieces:
+        diff[square(location)] = None
+    return diff
+
+
+class GameServer:
+    """Hosts any number of games on one event loop. Games are looked up by integer id. A game not used for
+    idle_seconds is replaced by its 33-byte encoding and decoded again on its next request, which drops its move
+    history. Engine replies run in the given executor, or in a process pool of engine_workers processes created on
+    first use. An executor broken by the death of a worker process is replaced by a new process pool"""
+
+    def __init__(self, idle_seconds=60.0, engine_depth=4, engine_time_limit=1.0, executor=None, engine_workers=None):
+        """Creates a server with no games. Engine replies search to engine_depth unless the request gives a depth,
+        and stop after engine_time_limit seconds"""
+        self._idle_seconds = idle_seconds
+        self._engine_depth = engine_depth
+        self._engine_time_limit = engine_time_limit
+        self._executor = executor
+        self._engine_workers = engine_workers
+        self._game_ids = itertools.count(1)
+        # Games in use, with the time of their last request, and games packed to bytes while idle
+        self._active = {}
+        self._last_used = {}
+        self._idle = {}
+
+    def __len__(self):
+        """Returns the number of open games, idle ones included"""
+        return len(self._active) + len(self._idle)
+
+    def _game(self, game_id):
+        """Returns the game with the given id, unpacking it if it was idle, or None if there is no such game"""
+        game = self._active.get(game_id)
+        if game is None:
+            encoded_position = self._idle.pop(game_id, None)
+            if encoded_position is None:
+                return None
+            game = self._active[game_id] = ChessVar.from_bytes(encoded_position)
+        self._last_used[game_id] = time.monotonic()
+        return game
+
+    def pack_idle_games(self):
+        """Packs every game not used for idle_seconds into its encoding. Returns the number of games packed"""
+        cutoff = time.monotonic() - self._idle_seconds
+        idle_ids = [game_id for game_id, last_used in self._last_used.items() if last_used < cutoff]
+        for game_id in idle_ids:
+            self._idle[game_id] = self._active.pop(game_id).to_bytes()
+            del self._last_used[game_id]
+        return len(idle_ids)
+
+    async def _pack_idle_games_forever(self):
+        """Packs idle games periodically, twice per idle period"""
+        while True:
+            await asyncio.sleep(self._idle_seconds / 2)
+            self.pack_idle_games()
+
+    def _get_executor(self):
+        """Returns the executor for engine replies, creating the process pool on first use and again after the pool in
+        use has broken"""
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._engine_workers)
+        return self._executor
+
+    def new_game(self):
+        """Starts a game and returns its response"""
+        game_id = next(self._game_ids)
+        game = self._active[game_id] = ChessVar()
+        self._last_used[game_id] = time.monotonic()
+        return {'ok': True, 'game': game_id, 'state': game.get_game_state(), 'turn': game._turn}
+
+    def play_move(self, game_id, square_moved_from, square_moved_to):
+        """Plays a move and returns the response with the new state and the board diff"""
+        game = self._game(game_id)
+        if game is None:
+            return {'ok': False, 'game': game_id, 'error': 'no such game'}
+        moves_played = len(game._move_history)
+        # make_move returns False when a move explodes both kings, although the move is played
+        game.make_move(square_moved_from, square_moved_to)
+        if len(game._move_history) == moves_played:
+            return {'ok': False, 'game': game_id, 'error': 'illegal move', 'state': game.get_game_state()}
+        return {'ok': True, 'game': game_id, 'state': game.get_game_state(), 'turn': game._turn,
+                'diff': _last_move_diff(game)}
+
+    async def engine_move(self, game_id, depth=None):
+        """Searches the game in the executor, plays the move found and returns the response"""
+        game = self._game(game_id)
+        if game is None:
+            return {'ok': False, 'game': game_id, 'error': 'no such game'}
+        if game.get_game_state() != 'UNFINISHED':
+            return {'ok': False, 'game': game_id, 'error': 'game is over', 'state': game.get_game_state()}
+        position_hash = game.get_position_hash()
+        executor = self._get_executor()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                executor, _search_share, game.to_bytes(), None, depth or self._engine_depth, self._engine_time_limit)
+        except concurrent.futures.process.BrokenProcessPool:
+            # A worker process died, which breaks the whole pool, so it is dropped and the next request starts a new
+            # one. Other requests may have dropped it already
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False)
+            return {'ok': False, 'game': game_id, 'error': 'engine unavailable'}
+        # The game may have been moved, closed or packed while the engine was thinking
+        game = self._game(game_id)
+        if game is None or game.get_position_hash() != position_hash:
+            return {'ok': False, 'game': game_id, 'error': 'position changed during the search'}
+        # An unfinished game can still leave the side to move without any move
+        if result.move is None:
+            return {'ok': False, 'game': game_id, 'error': 'no legal move', 'state': game.get_game_state()}
+        move = tuple(game.convert_location_to_square(location) for location in result.move)
+        response = self.play_move(game_id, *move)
+        response['move'] = move
+        response['score'] = result.score
+        return response
+
+    def board(self, game_id):
+        """Returns the response holding the whole board of a game"""
+        game = self._game(game_id)
+        if game is None:
+            return {'ok': False, 'game': game_id, 'error': 'no such game'}
+        return {'ok': True, 'game': game_id, 'state': game.get_game_state(), 'turn': game._turn,
+                'board': _board(game)}
+
+    def close_game(self, game_id):
+        """Ends a game and returns the response"""
+        found = self._active.pop(game_id, None) is not None or self._idle.pop(game_id, None) is not None
+        self._last_used.pop(game_id, None)
+        if not found:
+            return {'ok': False, 'game': game_id, 'error': 'no such game'}
+        return {'ok': True, 'game': game_id}
+
+    async def handle_request(self, line):
+        """Parses one request line and returns its response dict"""
+        words = line.split()
+        if not words:
+            return {'ok': False, 'error': 'empty request'}
+        command = words[0].upper()
+        try:
+            if command == 'NEW' and len(words) == 1:
+                return self.new_game()
+            if command == 'MOVE' and len(words) == 4:
+                if not (_SQUARE.fullmatch(words[2]) and _SQUARE.fullmatch(words[3])):
+                    return {'ok': False, 'error': 'bad request'}
+                return self.play_move(int(words[1]), words[2], words[3])
+            if command == 'ENGINE' and len(words) in (2, 3):
+                return await self.engine_move(int(words[1]), int(words[2]) if len(words) == 3 else None)
+            if command == 'BOARD' and len(words) == 2:
+                return self.board(int(words[1]))
+            if command == 'CLOSE' and len(words) == 2:
+                return self.close_game(int(words[1]))
+        except ValueError:
+            pass
+        return {'ok': False, 'error': 'bad request: %s' % line.strip()}
+
+    async def _handle_connection(self, reader, writer):
+        """Answers the requests of one client, in order, until it disconnects"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_request(line.decode('ascii', 'replace'))
+                writer.write(json.dumps(response, separators=(',', ':')).encode('ascii') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, ready=None):
+        """Listens for clients until cancelled. If ready is an asyncio.Event, it is set once the server listens"""
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        packer = asyncio.ensure_future(self._pack_idle_games_forever())
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            packer.cancel()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+
+
+def main():
+    """Runs the game server from the command line"""
+    parser = argparse.ArgumentParser(description='Atomic Chess game server')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on (default 8765)')
+    parser.add_argument('--idle', type=float, default=60.0,
+                        help='seconds after which an unused game is packed (default 60)')
+    parser.add_argument('--engine-depth', type=int, default=4, help='default engine search depth (default 4)')
+    parser.add_argument('--engine-workers', type=int, help='engine processes (default one per CPU)')
+    args = parser.parse_args()
+    server = GameServer(args.idle, args.engine_depth, engine_workers=args.engine_workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
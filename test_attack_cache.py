@@ -0,0 +1,80 @@
+# Description: Tests of the attack-map cache: cached moves agree with generate_moves, attacks agree with the batch
+# attack maps when NumPy is installed, cached maps cannot be changed, and the cache stays within its bound.
+
+import unittest
+
+from ChessVar import ChessVar
+from attack_cache import AttackMapCache, build_attack_maps
+from selfplay import random_walk
+from test_chessvar import GAME_SEEDS, MAX_PLIES
+
+
+def _random_positions():
+    """Yields a copy of every position of the random games of the tests"""
+    for seed in GAME_SEEDS:
+        for game, _ in random_walk(seed, MAX_PLIES):
+            yield ChessVar.from_position(*game.get_position()[1:], turn=game._turn)
+
+
+class AttackMapCacheTest(unittest.TestCase):
+    """AttackMapCache and build_attack_maps"""
+
+    def test_cached_moves_match_generate_moves(self):
+        cache = AttackMapCache(max_entries=64)
+        for game in _random_positions():
+            self.assertEqual(sorted(cache.legal_moves(game)), sorted(game.generate_moves()))
+            maps = cache.get(game)
+            moves = maps.white_moves if game._turn == 'white' else maps.black_moves
+            destinations = maps.white_destinations if game._turn == 'white' else maps.black_destinations
+            self.assertEqual(destinations, {target for targets in moves.values() for target in targets})
+        self.assertLessEqual(len(cache), 64)
+
+    def test_attacks_match_batch_attack_maps(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('NumPy is not installed')
+        from batch import attack_maps, boards_from_games
+        games = list(_random_positions())
+        boards, _ = boards_from_games(games)
+        expected = attack_maps(boards)
+        for index, game in enumerate(games):
+            maps = build_attack_maps(game)
+            for side, attacks in enumerate((maps.white_attacks, maps.black_attacks)):
+                self.assertEqual(attacks, {(square & 7, square >> 3)
+                                           for square in numpy.flatnonzero(expected[index, side])})
+
+    def test_cached_maps_are_read_only(self):
+        cache = AttackMapCache()
+        maps = cache.get(ChessVar())
+        with self.assertRaises(TypeError):
+            maps.white_moves[(0, 0)] = ()
+        self.assertEqual(cache.piece_moves(ChessVar(), 'g1'), ['h3', 'f3'])
+
+    def test_positions_differing_in_side_to_move_share_an_entry(self):
+        cache = AttackMapCache()
+        turn, white_pieces, black_pieces = ChessVar().get_position()
+        cache.get(ChessVar.from_position(white_pieces, black_pieces, 'white'))
+        cache.get(ChessVar.from_position(white_pieces, black_pieces, 'black'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_eviction_policies(self):
+        games = list(_random_positions())[:3]
+        for eviction, kept in (('lru', games[0]), ('fifo', games[1])):
+            with self.subTest(eviction=eviction):
+                cache = AttackMapCache(max_entries=2, eviction=eviction)
+                cache.get(games[0])
+                cache.get(games[1])
+                # A hit on the first position keeps it with LRU eviction but not with FIFO
+                cache.get(games[0])
+                cache.get(games[2])
+                self.assertEqual(cache.evictions, 1)
+                misses = cache.misses
+                cache.get(kept)
+                self.assertEqual(cache.misses, misses)
+        with self.assertRaises(ValueError):
+            AttackMapCache(eviction='random')
+
+
+if __name__ == '__main__':
+    unittest.main()
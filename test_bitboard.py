@@ -0,0 +1,99 @@
+# Description: Lockstep tests of the bitboard move generation backend against the list-based generation of ChessVar.
+# Random games are played with the list backend, and at every position both backends must give the same moves. The
+# perft suite is also run with the bitboard backend switched on through ChessVar.set_move_generation.
+
+import unittest
+
+import bitboard
+from ChessVar import ChessVar
+from perft import perft, suite
+from selfplay import random_walk
+from test_chessvar import GAME_SEEDS, MAX_PLIES
+
+
+def _list_moves(game):
+    """Returns the moves of the list backend, whichever backend is switched on"""
+    return list(ChessVar._generate_list_moves(game))
+
+
+class BitboardMovesTest(unittest.TestCase):
+    """generate_location_moves giving exactly the moves of the list backend"""
+
+    def assert_same_moves(self, game):
+        """Checks that both backends give the same moves, each once"""
+        bitboard_moves = bitboard.generate_location_moves(game)
+        self.assertEqual(len(bitboard_moves), len(set(bitboard_moves)))
+        self.assertEqual(set(bitboard_moves), set(_list_moves(game)))
+
+    def play_random_games(self):
+        """Plays the random games, checking the moves at every position"""
+        for seed in GAME_SEEDS:
+            with self.subTest(seed=seed):
+                self.assert_same_moves(ChessVar())
+                for game, _ in random_walk(seed, MAX_PLIES):
+                    self.assert_same_moves(game)
+
+    def test_random_games(self):
+        self.play_random_games()
+
+    def test_random_games_with_caches_emptied_on_every_store(self):
+        cache_limit = bitboard.CACHE_LIMIT
+        bitboard.CACHE_LIMIT = 1
+        try:
+            self.play_random_games()
+        finally:
+            bitboard.CACHE_LIMIT = cache_limit
+
+    def test_caches_hold_at_most_cache_limit_move_lists(self):
+        cache_limit = bitboard.CACHE_LIMIT
+        bitboard.CACHE_LIMIT = 100
+        try:
+            self.play_random_games()
+            cached = sum(len(cache) for caches in bitboard._move_caches.values() for cache in caches)
+            self.assertEqual(cached, bitboard._cached_move_lists)
+            self.assertLessEqual(cached, 100)
+        finally:
+            bitboard.CACHE_LIMIT = cache_limit
+
+    def test_finished_game_has_no_moves(self):
+        game = ChessVar.from_position({(4, 0): 'king', (3, 3): 'rook'}, {(0, 7): 'rook'}, 'black')
+        self.assertEqual(bitboard.generate_location_moves(game), [])
+
+
+class MoveGenerationSwitchTest(unittest.TestCase):
+    """Switching ChessVar to the bitboard backend"""
+
+    def setUp(self):
+        ChessVar.set_move_generation('bitboard')
+
+    def tearDown(self):
+        ChessVar.set_move_generation('lists')
+
+    def test_perft_suite_counts(self):
+        for name, game, expected in suite():
+            for depth in (1, 2, 3):
+                with self.subTest(position=name, depth=depth):
+                    self.assertEqual(perft(game, depth), expected[depth])
+
+    def test_generate_moves_uses_bitboard_backend(self):
+        game = ChessVar()
+        self.assertEqual(sorted(game.generate_moves()),
+                         sorted((game.convert_location_to_square(from_location),
+                                 game.convert_location_to_square(to_location))
+                                for from_location, to_location in _list_moves(game)))
+        self.assertIs(ChessVar._generate_location_moves, bitboard.generate_location_moves)
+
+    def test_switching_back_to_lists_clears_caches(self):
+        perft(ChessVar(), 2)
+        self.assertGreater(bitboard._cached_move_lists, 0)
+        ChessVar.set_move_generation('lists')
+        self.assertEqual(bitboard._cached_move_lists, 0)
+        self.assertFalse(any(cache for caches in bitboard._move_caches.values() for cache in caches))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            ChessVar.set_move_generation('arrays')
+
+
+if __name__ == '__main__':
+    unittest.main()
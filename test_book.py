@@ -0,0 +1,108 @@
+# Description: Tests of the position books of book.py: the on-disk format written by write_book and build_book, the
+# binary search of PositionBook.lookup at its edges, the rejection of files that are not books, and the use of books
+# by ChessVar.book_move and ChessVar.best_move.
+
+import os
+import tempfile
+import unittest
+
+from book import HEADER, MAGIC, RECORD, BookEntry, PositionBook, build_book, write_book
+from ChessVar import ChessVar
+from search import evaluate
+from selfplay import generate_games
+
+
+class BookTestCase(unittest.TestCase):
+    """A test with a temporary directory to write books to"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'test.book')
+
+
+class WriteBookTest(BookTestCase):
+    """Books written by write_book and read back with PositionBook"""
+
+    def test_format_and_lookup_edges(self):
+        records = [(9, ((4, 1), (4, 3)), 2, 5), (1, ((0, 0), (7, 7)), -1, 1), (5, ((6, 0), (5, 2)), 0, 3),
+                   (5, ((3, 1), (3, 3)), 4, 7), (2 ** 64 - 1, ((1, 0), (2, 2)), 1, 2)]
+        self.assertEqual(write_book(self.path, records), 4)
+        with open(self.path, 'rb') as book_file:
+            data = book_file.read()
+        self.assertEqual(HEADER.unpack_from(data), (MAGIC, 4))
+        self.assertEqual(len(data), HEADER.size + 4 * RECORD.size)
+        hashes = [RECORD.unpack_from(data, HEADER.size + index * RECORD.size)[0] for index in range(4)]
+        self.assertEqual(hashes, [1, 5, 9, 2 ** 64 - 1])
+        with PositionBook(self.path) as book:
+            self.assertEqual(len(book), 4)
+            # First and last records, and the record kept for a repeated hash, the one with the most games
+            self.assertEqual(book.lookup(1), BookEntry(('a1', 'h8'), -1, 1))
+            self.assertEqual(book.lookup(2 ** 64 - 1), BookEntry(('b1', 'c3'), 1, 2))
+            self.assertEqual(book.lookup(5), BookEntry(('d2', 'd4'), 4, 7))
+            self.assertEqual(book.lookup(9), BookEntry(('e2', 'e4'), 2, 5))
+            for position_hash in (0, 2, 6, 10, 2 ** 64 - 2):
+                with self.subTest(position_hash=position_hash):
+                    self.assertIsNone(book.lookup(position_hash))
+
+    def test_book_without_records(self):
+        self.assertEqual(write_book(self.path, []), 0)
+        with PositionBook(self.path) as book:
+            self.assertEqual(len(book), 0)
+            self.assertIsNone(book.lookup(ChessVar().get_position_hash()))
+
+    def test_bad_files_are_rejected(self):
+        write_book(self.path, [(1, ((0, 0), (7, 7)), 0, 1)])
+        with open(self.path, 'rb') as book_file:
+            data = book_file.read()
+        for name, bad_data in (('empty', b''), ('header only', b'ACB'), ('bad magic', b'XXXX' + data[4:]),
+                               ('truncated', data[:-1]), ('trailing bytes', data + b'\x00')):
+            with self.subTest(name=name):
+                with open(self.path, 'wb') as book_file:
+                    book_file.write(bad_data)
+                with self.assertRaises(ValueError):
+                    PositionBook(self.path)
+
+
+class BuildBookTest(BookTestCase):
+    """Books built from games, and used by ChessVar"""
+
+    def test_book_moves_from_games(self):
+        games = [[('e2', 'e4'), ('e7', 'e5')], [('e2', 'e4'), ('d7', 'd5')], [('d2', 'd4'), ('e2', 'e2')]]
+        self.assertEqual(build_book(self.path, games, max_plies=1), 1)
+        with PositionBook(self.path) as book:
+            # No game was won, so the book move of the starting position is the more frequent one
+            self.assertEqual(book.lookup(ChessVar().get_position_hash()), BookEntry(('e2', 'e4'), 0, 3))
+        self.assertEqual(build_book(self.path, games, min_games=2), 2)
+
+    def test_won_games_outscore_frequent_moves(self):
+        win = next(game.moves for game in generate_games(100) if game.state == 'WHITE_WON')
+        other_move = next(move for move in ChessVar().generate_moves() if move != win[0])
+        build_book(self.path, [win, [other_move], [other_move]], max_plies=1)
+        with PositionBook(self.path) as book:
+            self.assertEqual(book.lookup(ChessVar().get_position_hash()), BookEntry(win[0], 1, 3))
+
+    def test_book_move_and_best_move(self):
+        game = ChessVar()
+        write_book(self.path, [(game.get_position_hash(), ((6, 0), (5, 2)), 3, 4)])
+        with PositionBook(self.path) as book:
+            self.assertEqual(game.book_move(book), BookEntry(('g1', 'f3'), 3, 4))
+            result = game.best_move(depth=3, book=book)
+            self.assertEqual((result.move, result.depth), (('g1', 'f3'), 0))
+            self.assertEqual(game.get_position(), ChessVar().get_position())
+            game.make_move('g1', 'f3')
+            self.assertEqual(result.score, -evaluate(game))
+            # Positions not in the book are searched
+            self.assertIsNone(game.book_move(book))
+            self.assertGreater(game.best_move(depth=1, book=book).depth, 0)
+
+    def test_illegal_book_move_is_ignored(self):
+        game = ChessVar()
+        write_book(self.path, [(game.get_position_hash(), ((4, 1), (4, 4)), 3, 4)])
+        with PositionBook(self.path) as book:
+            self.assertIsNone(game.book_move(book))
+            self.assertNotEqual(game.best_move(depth=1, book=book).move, ('e2', 'e5'))
+
+
+if __name__ == '__main__':
+    unittest.main()
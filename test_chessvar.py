@@ -0,0 +1,256 @@
+# Description: Tests of the ChessVar game state kept up to date as moves are made and undone. Random games are played
+# with selfplay.random_walk, and after every move the tracked kings, material, game state and position hash are
+# compared with values computed from scratch for the same position, and undo_move is checked to restore every earlier
+# position. The perft suite pins down the rules themselves.
+
+import os
+import signal
+import unittest
+
+import parallel_search
+from ChessVar import ChessVar
+from perft import perft, suite
+from selfplay import random_walk
+
+# Seeds and length of the random games played by the tests of this and the other test modules
+GAME_SEEDS = range(40)
+MAX_PLIES = 120
+
+
+def _rebuilt(game):
+    """Returns a new game set up from the position of a game, so that everything it tracks is computed from scratch"""
+    turn, white_pieces, black_pieces = game.get_position()
+    return ChessVar.from_position(white_pieces, black_pieces, turn)
+
+
+class TrackedStateTest(unittest.TestCase):
+    """The tracked king locations, material and game state"""
+
+    def assert_tracked_state(self, game):
+        """Checks everything the game tracks against a game rebuilt from the same position"""
+        expected = _rebuilt(game)
+        self.assertEqual(game._white_king, expected._white_king)
+        self.assertEqual(game._black_king, expected._black_king)
+        self.assertEqual(game._white_material, expected._white_material)
+        self.assertEqual(game._black_material, expected._black_material)
+        self.assertEqual(game._state, expected._state)
+
+    def test_tracked_state_matches_rebuilt_game_after_every_move(self):
+        for seed in GAME_SEEDS:
+            with self.subTest(seed=seed):
+                for game, _ in random_walk(seed, MAX_PLIES):
+                    self.assert_tracked_state(game)
+
+    def test_tracked_state_matches_rebuilt_game_after_every_undo(self):
+        for seed in GAME_SEEDS:
+            with self.subTest(seed=seed):
+                for game, _ in random_walk(seed, MAX_PLIES):
+                    pass
+                while game.undo_move():
+                    self.assert_tracked_state(game)
+
+    def test_new_and_reset_games_match_rebuilt_game(self):
+        game = ChessVar()
+        self.assert_tracked_state(game)
+        self.assertEqual(game.get_position_hash(), _rebuilt(game).get_position_hash())
+        game.make_move('e2', 'e4')
+        game.reset()
+        self.assert_tracked_state(game)
+        self.assertEqual(game.get_position(), ChessVar().get_position())
+        self.assertEqual(game.get_position_hash(), game._compute_position_hash())
+
+    def test_capture_next_to_king_ends_game(self):
+        game = ChessVar.from_position({(4, 0): 'king', (3, 3): 'rook'}, {(4, 7): 'king', (3, 6): 'knight'})
+        self.assertTrue(game.make_move('d4', 'd7'))
+        self.assertEqual(game.get_game_state(), 'WHITE_WON')
+        self.assertIsNone(game.get_king_location('black'))
+        self.assertEqual(game.get_material('white'), 0)
+        self.assertEqual(game.get_material('black'), 0)
+
+
+class UndoTest(unittest.TestCase):
+    """undo_move restoring the pieces, the turn and the hash"""
+
+    def test_undo_restores_every_earlier_position(self):
+        for seed in GAME_SEEDS:
+            with self.subTest(seed=seed):
+                start = ChessVar()
+                positions = [(start.get_position(), start.get_position_hash())]
+                for game, _ in random_walk(seed, MAX_PLIES):
+                    positions.append((game.get_position(), game.get_position_hash()))
+                # The position after the last move is the current one
+                positions.pop()
+                while positions:
+                    self.assertTrue(game.undo_move())
+                    self.assertEqual((game.get_position(), game.get_position_hash()), positions.pop())
+                self.assertFalse(game.undo_move())
+
+    def test_undo_restores_exploded_pieces(self):
+        white_pieces = {(4, 0): 'king', (3, 0): 'queen', (3, 3): 'rook', (2, 5): 'pawn', (4, 5): 'bishop'}
+        black_pieces = {(4, 7): 'king', (3, 6): 'knight', (2, 7): 'bishop', (3, 7): 'queen', (4, 6): 'pawn'}
+        game = ChessVar.from_position(white_pieces, black_pieces)
+        position_hash = game.get_position_hash()
+        # The rook, the knight, the black king, bishop and queen and the white bishop go; the pawns stay
+        game.make_move('d4', 'd7')
+        self.assertEqual(game.get_position(), ('black', {(4, 0): 'king', (3, 0): 'queen', (2, 5): 'pawn'},
+                                               {(4, 6): 'pawn'}))
+        self.assertTrue(game.undo_move())
+        self.assertEqual(game.get_position(), ('white', white_pieces, black_pieces))
+        self.assertEqual(game.get_position_hash(), position_hash)
+        self.assertEqual(game.get_game_state(), 'UNFINISHED')
+        self.assertEqual(game.get_king_location('black'), (4, 7))
+
+
+class PositionHashTest(unittest.TestCase):
+    """The Zobrist hash kept up to date by _play_move"""
+
+    def test_hash_matches_recompute_after_every_move(self):
+        captures = 0
+        for seed in GAME_SEEDS:
+            with self.subTest(seed=seed):
+                for game, _ in random_walk(seed, MAX_PLIES):
+                    self.assertEqual(game.get_position_hash(), game._compute_position_hash())
+                    captures += game._move_history[-1][3] is not None
+        # Captures and explosions update the hash differently from quiet moves
+        self.assertGreater(captures, 100)
+
+    def test_hash_after_explosion(self):
+        game = ChessVar.from_position({(4, 0): 'king', (3, 3): 'rook', (4, 5): 'bishop'},
+                                      {(4, 7): 'king', (3, 6): 'knight', (0, 6): 'pawn'})
+        game.make_move('d4', 'd7')
+        self.assertEqual(game.get_position_hash(), game._compute_position_hash())
+        self.assertEqual(game.get_position_hash(), _rebuilt(game).get_position_hash())
+
+    def test_transposed_move_orders_give_equal_hashes(self):
+        first, second = ChessVar(), ChessVar()
+        for square_from, square_to in (('b1', 'c3'), ('g8', 'f6'), ('g1', 'f3'), ('b8', 'c6')):
+            self.assertTrue(first.make_move(square_from, square_to))
+        for square_from, square_to in (('g1', 'f3'), ('b8', 'c6'), ('b1', 'c3'), ('g8', 'f6')):
+            self.assertTrue(second.make_move(square_from, square_to))
+        self.assertEqual(first.get_position(), second.get_position())
+        self.assertEqual(first.get_position_hash(), second.get_position_hash())
+
+    def test_side_to_move_changes_hash(self):
+        game = ChessVar()
+        turn, white_pieces, black_pieces = game.get_position()
+        self.assertNotEqual(game.get_position_hash(),
+                            ChessVar.from_position(white_pieces, black_pieces, 'black').get_position_hash())
+
+
+class ExplosionImpactTest(unittest.TestCase):
+    """explosion_impact reporting exactly what _play_move removes"""
+
+    def assert_impact_matches_move(self, game, square_from, square_to):
+        """Checks the impact of a legal move against the pieces the move removes, and returns whether it captures"""
+        impact = game.explosion_impact(square_from, square_to)
+        turn, white_before, black_before = game.get_position()
+        game.make_move(square_from, square_to)
+        _, white_after, black_after = game.get_position()
+        game.undo_move()
+        opponent_before = black_before if turn == 'white' else white_before
+        if game.convert_square_to_location(square_to) not in opponent_before:
+            self.assertIsNone(impact)
+            return False
+        # The moved piece is the only one a capture leaves on a new square, and it is removed too
+        for losses, before, after in ((impact.white_losses, white_before, white_after),
+                                      (impact.black_losses, black_before, black_after)):
+            removed = {(game.convert_location_to_square(location), piece) for location, piece in before.items()
+                       if location not in after}
+            self.assertEqual(len(losses), len(set(losses)))
+            self.assertEqual(set(losses), removed)
+        self.assertEqual(impact.white_king_destroyed, game.get_king_location('white') is not None and
+                         'king' not in white_after.values())
+        self.assertEqual(impact.black_king_destroyed, game.get_king_location('black') is not None and
+                         'king' not in black_after.values())
+        return True
+
+    def test_impact_matches_played_captures(self):
+        captures = 0
+        for seed in GAME_SEEDS:
+            with self.subTest(seed=seed):
+                for game, _ in random_walk(seed, MAX_PLIES):
+                    for square_from, square_to in list(game.generate_moves()):
+                        captures += self.assert_impact_matches_move(game, square_from, square_to)
+        self.assertGreater(captures, 1000)
+
+    def test_capturing_piece_next_to_its_own_king(self):
+        game = ChessVar.from_position({(4, 3): 'king', (3, 3): 'rook', (2, 4): 'pawn'},
+                                      {(4, 7): 'king', (3, 4): 'knight'})
+        impact = game.explosion_impact('d4', 'd5')
+        # The rook stands in the blast, but is lost once, as the capturing piece
+        self.assertEqual(impact.white_losses, (('d4', 'rook'), ('e4', 'king')))
+        self.assertEqual(impact.black_losses, (('d5', 'knight'),))
+        self.assertTrue(impact.white_king_destroyed)
+        self.assertFalse(impact.black_king_destroyed)
+        self.assertTrue(self.assert_impact_matches_move(game, 'd4', 'd5'))
+
+    def test_non_captures_give_none(self):
+        game = ChessVar()
+        self.assertIsNone(game.explosion_impact('e2', 'e4'))
+        # Pieces of the side not to move, empty squares and own pieces are not captures either
+        self.assertIsNone(game.explosion_impact('e7', 'e2'))
+        self.assertIsNone(game.explosion_impact('e4', 'e7'))
+        self.assertIsNone(game.explosion_impact('d1', 'e1'))
+
+
+class SharedTablesTest(unittest.TestCase):
+    """The move tables shared by every game"""
+
+    def test_tables_are_read_only(self):
+        game = ChessVar()
+        for table in (game._king_possible_moves, game._knight_possible_moves, game._white_pawn_possible_moves,
+                      game._black_pawn_possible_moves, game._blast_squares, game._zobrist_keys, game._piece_values):
+            with self.assertRaises(TypeError):
+                table[(0, 0)] = ()
+        for table in (game._rook_possible_moves, game._bishop_possible_moves):
+            with self.assertRaises(TypeError):
+                table[(0, 0)] = {}
+            with self.assertRaises(TypeError):
+                table[(0, 0)]['up' if table is game._rook_possible_moves else 'ne'] = ()
+
+    def test_games_share_tables(self):
+        self.assertIs(ChessVar()._rook_possible_moves, ChessVar()._rook_possible_moves)
+
+
+class SearchWorkersTest(unittest.TestCase):
+    """The process pool parallel_search.py keeps for the multi-process searches of best_move"""
+
+    def tearDown(self):
+        parallel_search.shutdown_search_workers()
+
+    def test_pool_is_kept_between_searches(self):
+        game = ChessVar()
+        first = game.best_move(depth=2, workers=2)
+        executor = parallel_search._search_executor
+        self.assertIsNotNone(executor)
+        second = game.best_move(depth=2, workers=2)
+        self.assertIs(parallel_search._search_executor, executor)
+        self.assertEqual(first.move, second.move)
+        game.best_move(depth=1, workers=3)
+        self.assertIsNot(parallel_search._search_executor, executor)
+        parallel_search.shutdown_search_workers()
+        self.assertIsNone(parallel_search._search_executor)
+
+    @unittest.skipUnless(hasattr(signal, 'SIGKILL'), 'needs SIGKILL')
+    def test_pool_is_replaced_when_a_worker_dies(self):
+        game = ChessVar()
+        expected = game.best_move(depth=1, workers=2)
+        executor = parallel_search._search_executor
+        os.kill(next(iter(executor._processes)), signal.SIGKILL)
+        self.assertEqual(game.best_move(depth=1, workers=2).move, expected.move)
+        self.assertIsNot(parallel_search._search_executor, executor)
+        self.assertEqual(game.best_move(depth=1, workers=2).move, expected.move)
+
+
+class PerftTest(unittest.TestCase):
+    """The perft suite to depth 3, which checks move generation, moves, explosions and undo together"""
+
+    def test_suite_counts(self):
+        for name, game, expected in suite():
+            for depth in (1, 2, 3):
+                with self.subTest(position=name, depth=depth):
+                    self.assertEqual(perft(game, depth), expected[depth])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# Description: Differential tests of CompactChessVar against ChessVar. The same random games are played on both, and
+# at every position their moves, make_move results, game states, encodings and position hashes must agree.
+
+import contextlib
+import io
+import unittest
+
+from ChessVar import ChessVar
+from compact import CompactChessVar
+from selfplay import random_walk
+from test_chessvar import GAME_SEEDS, MAX_PLIES
+
+# Moves that are illegal in most positions, one of them off the board
+ILLEGAL_PROBES = (('e2', 'e5'), ('a1', 'h8'), ('i9', 'a1'), ('d1', 'd2'))
+
+
+def _printed_board(game):
+    """Returns what print_board prints for a game"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        game.print_board()
+    return output.getvalue()
+
+
+class CompactChessVarTest(unittest.TestCase):
+    """CompactChessVar behaving exactly like ChessVar"""
+
+    def assert_same_position(self, compact_game, game):
+        """Checks everything the two games report about their position, and that they agree on illegal moves"""
+        self.assertEqual(compact_game.get_position(), game.get_position())
+        self.assertEqual(compact_game.get_game_state(), game.get_game_state())
+        self.assertEqual(compact_game.to_bytes(), game.to_bytes())
+        self.assertEqual(compact_game.get_position_hash(), game.get_position_hash())
+        self.assertEqual(sorted(compact_game.generate_moves()), sorted(game.generate_moves()))
+        for square_from, square_to in ILLEGAL_PROBES:
+            self.assertEqual(compact_game.is_legal(square_from, square_to), game.is_legal(square_from, square_to))
+
+    def test_random_games_match_chessvar(self):
+        for seed in GAME_SEEDS:
+            with self.subTest(seed=seed):
+                compact_game = CompactChessVar()
+                self.assert_same_position(compact_game, ChessVar())
+                for game, move in random_walk(seed, MAX_PLIES):
+                    move = tuple(game.convert_location_to_square(location) for location in move)
+                    self.assertTrue(compact_game.is_legal(*move))
+                    # make_move returns False for a capture that destroys both kings, although it plays it
+                    self.assertIs(compact_game.make_move(*move),
+                                  game.get_king_location('white') is not None or
+                                  game.get_king_location('black') is not None)
+                    self.assert_same_position(compact_game, game)
+                self.assertEqual(_printed_board(compact_game), _printed_board(game))
+
+    def test_illegal_moves_are_rejected_alike(self):
+        game, compact_game = ChessVar(), CompactChessVar()
+        for square_from, square_to in ILLEGAL_PROBES:
+            self.assertIs(compact_game.make_move(square_from, square_to), False)
+            self.assertIs(game.make_move(square_from, square_to), False)
+        self.assert_same_position(compact_game, game)
+
+    def test_simultaneous_king_explosion(self):
+        white_pieces = {(4, 3): 'king', (2, 2): 'bishop'}
+        black_pieces = {(4, 5): 'king', (4, 4): 'knight'}
+        game = ChessVar.from_position(white_pieces, black_pieces)
+        compact_game = CompactChessVar.from_position(white_pieces, black_pieces)
+        # Capturing on e5 explodes both kings, so make_move returns False although the move is played
+        self.assertIs(compact_game.make_move('c3', 'e5'), False)
+        self.assertIs(game.make_move('c3', 'e5'), False)
+        self.assertEqual(game.get_position(), ('black', {}, {}))
+        self.assert_same_position(compact_game, game)
+
+    def test_conversions_round_trip(self):
+        game = ChessVar()
+        for move in (('e2', 'e4'), ('d7', 'd5'), ('e4', 'd5')):
+            game.make_move(*move)
+        compact_game = CompactChessVar.from_game(game)
+        self.assert_same_position(compact_game, game)
+        self.assert_same_position(CompactChessVar.from_bytes(game.to_bytes()), game)
+        self.assertEqual(compact_game.to_game().get_position(), game.get_position())
+
+    def test_from_bytes_rejects_bad_data(self):
+        with self.assertRaises(ValueError):
+            CompactChessVar.from_bytes(bytes(32))
+        with self.assertRaises(ValueError):
+            CompactChessVar.from_bytes(b'\x07' + bytes(32))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# Description: Tests of the binary encoding of encoding.py: positions and moves round trip through their encodings,
+# and buffers of the wrong length or with invalid piece codes are rejected.
+
+import unittest
+
+from ChessVar import ChessVar
+from encoding import POSITION_SIZE, decode_moves, decode_position, encode_moves, iter_positions
+
+
+class PositionEncodingTest(unittest.TestCase):
+    """Positions encoded in 33 bytes"""
+
+    def test_round_trip(self):
+        game = ChessVar()
+        for move in (('e2', 'e4'), ('d7', 'd5'), ('e4', 'd5')):
+            game.make_move(*move)
+        data = game.to_bytes()
+        self.assertEqual(len(data), POSITION_SIZE)
+        self.assertEqual(ChessVar.from_bytes(data).get_position(), game.get_position())
+        self.assertEqual(decode_position(bytes(5) + data, 5).get_position(), game.get_position())
+        self.assertEqual([position.get_position() for position in iter_positions(data * 2)],
+                         [game.get_position()] * 2)
+
+    def test_wrong_length_is_rejected(self):
+        data = ChessVar().to_bytes()
+        for bad_data in (data[:32], data + b'\x00', b''):
+            with self.subTest(length=len(bad_data)):
+                with self.assertRaises(ValueError):
+                    ChessVar.from_bytes(bad_data)
+        with self.assertRaises(ValueError):
+            decode_position(data[:32])
+        with self.assertRaises(ValueError):
+            decode_position(data, 1)
+        with self.assertRaises(ValueError):
+            iter_positions(data[:32]).__next__()
+
+    def test_invalid_piece_code_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ChessVar.from_bytes(b'\x07' + bytes(32))
+
+
+class MoveEncodingTest(unittest.TestCase):
+    """Moves packed into 16 bits each"""
+
+    def test_round_trip(self):
+        moves = [('e2', 'e4'), ('a1', 'h8'), ('h8', 'a1'), ('g8', 'f6')]
+        data = encode_moves(moves)
+        self.assertEqual(len(data), 2 * len(moves))
+        self.assertEqual(decode_moves(data), moves)
+
+    def test_square_off_the_board_is_rejected(self):
+        with self.assertRaises(ValueError):
+            encode_moves([('e2', 'e4'), ('i9', 'a1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Description: Tests of the game record readers and writers of pgn.py: round trips through both forms, with lazy and
+# eager parsing, and the places where the PGN-like form splits games.
+
+import io
+import unittest
+
+from pgn import STATE_RESULTS, GameRecord, LineWriter, PGNWriter, parse_moves, read_lines, read_pgn
+from selfplay import generate_games
+
+
+class RoundTripTest(unittest.TestCase):
+    """Games written by the writers and read back by the readers"""
+
+    def setUp(self):
+        self.games = list(generate_games(20, seed=3))
+
+    def assert_round_trip(self, writer_class, reader):
+        output = io.StringIO()
+        with writer_class(output) as writer:
+            for game in self.games:
+                writer.write_game(game.moves, STATE_RESULTS[game.state], {'Event': 'a "quoted" \\ name'})
+        for lazy in (True, False):
+            records = list(reader(io.StringIO(output.getvalue()), lazy=lazy))
+            self.assertEqual([record.moves for record in records], [game.moves for game in self.games])
+            self.assertEqual([record.result for record in records],
+                             [STATE_RESULTS[game.state] for game in self.games])
+            for record, game in zip(records, self.games):
+                self.assertEqual(record.play().get_game_state(), game.state)
+        return records
+
+    def test_pgn_round_trip(self):
+        records = self.assert_round_trip(PGNWriter, read_pgn)
+        self.assertEqual(records[0].tags['Event'], 'a "quoted" \\ name')
+
+    def test_line_round_trip(self):
+        self.assert_round_trip(LineWriter, read_lines)
+
+
+class ReadPGNTest(unittest.TestCase):
+    """How read_pgn splits a file into games"""
+
+    def read(self, text):
+        return list(read_pgn(io.StringIO(text)))
+
+    def test_game_with_tags_only(self):
+        records = self.read('[Event "only tags"]\n\n[Event "b"]\n\n1. e2e4 *\n')
+        self.assertEqual([record.tags for record in records], [{'Event': 'only tags'}, {'Event': 'b'}])
+        self.assertEqual([record.moves for record in records], [[], [('e2', 'e4')]])
+
+    def test_tag_after_move_text_starts_a_game(self):
+        records = self.read('[Event "a"]\n1. d2d4 1-0\n[Event "b"]\n1. e2e4 *\n')
+        self.assertEqual([record.tags['Event'] for record in records], ['a', 'b'])
+        self.assertEqual([record.result for record in records], ['1-0', '*'])
+
+    def test_blank_line_and_tag_inside_comment(self):
+        records = self.read('[Event "a"]\n\n1. e2e4 {a long\n\n[Not "a tag"]\ncomment} e7e5 ; a { brace\n2. g1f3 *\n')
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].moves, [('e2', 'e4'), ('e7', 'e5'), ('g1', 'f3')])
+
+    def test_invalid_tag(self):
+        with self.assertRaises(ValueError):
+            self.read('[Event a]\n')
+
+
+class ParseMovesTest(unittest.TestCase):
+    """Parsing move text"""
+
+    def test_move_numbers_separators_and_result(self):
+        self.assertEqual(parse_moves('1.e2-e4 e7xe5 2... g1f3 1/2-1/2'),
+                         ([('e2', 'e4'), ('e7', 'e5'), ('g1', 'f3')], '1/2-1/2'))
+
+    def test_invalid_moves(self):
+        for movetext in ('Nf3', '1.Nf3', 'e2e4e5', '1-0x', '{unterminated'):
+            with self.subTest(movetext=movetext):
+                with self.assertRaises(ValueError):
+                    parse_moves(movetext)
+
+    def test_illegal_move_is_reported(self):
+        with self.assertRaisesRegex(ValueError, 'illegal move 2: e2e4'):
+            GameRecord({}, 'e2e4 e2e4').play()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Description: Tests of the bulk replay of replay.py: the results of legal games, games with an illegal move or a
+# capture destroying both kings, moves given as pairs or as strings, and replays in worker processes.
+
+import unittest
+
+from ChessVar import ChessVar
+from replay import ReplayResult, replay_game, replay_games
+from selfplay import generate_games
+
+# A game whose last move, a bishop capturing the white king on f4, also explodes the black king on f3
+BOTH_KINGS_DESTROYED = [('g2', 'g4'), ('e7', 'e5'), ('f2', 'g2'), ('e8', 'e7'), ('a2', 'a4'), ('e7', 'f6'),
+                        ('e1', 'f2'), ('f6', 'f5'), ('b1', 'a3'), ('g7', 'e7'), ('f2', 'e3'), ('f5', 'f4'),
+                        ('d2', 'd4'), ('f4', 'f3'), ('c2', 'd2'), ('f8', 'h6'), ('d4', 'e4'), ('e5', 'd5'),
+                        ('e3', 'f4'), ('h6', 'f4')]
+
+
+def _captures(moves):
+    """Returns the number of moves of a legal game that capture a piece, counted with make_move"""
+    game = ChessVar()
+    captures = 0
+    for square_from, square_to in moves:
+        turn, white_pieces, black_pieces = game.get_position()
+        opponent_pieces = black_pieces if turn == 'white' else white_pieces
+        captures += game.convert_square_to_location(square_to) in opponent_pieces
+        game.make_move(square_from, square_to)
+    return captures
+
+
+def _hash_after(moves):
+    """Returns the position hash after playing moves given as strings like 'e2e4' from the starting position"""
+    game = ChessVar()
+    for move in moves:
+        game.make_move(move[:2], move[2:])
+    return game.get_position_hash()
+
+
+class ReplayGameTest(unittest.TestCase):
+    """Results of replay_game"""
+
+    def setUp(self):
+        self.game = ChessVar()
+        self.moves = next(game.moves for game in generate_games(50) if game.state == 'WHITE_WON')
+
+    def test_legal_game(self):
+        result = replay_game(self.game, self.moves)
+        self.assertEqual(result, ReplayResult('WHITE_WON', None, _captures(self.moves), len(self.moves)))
+        self.assertGreater(result.explosions, 0)
+
+    def test_string_moves_match_pairs(self):
+        strings = [square_from + square_to for square_from, square_to in self.moves]
+        self.assertEqual(replay_game(self.game, strings), replay_game(self.game, self.moves))
+
+    def test_first_illegal_move(self):
+        for bad_move in (('e2', 'e5'), ('i9', 'a1'), 'e2', 'e7e5'):
+            with self.subTest(bad_move=bad_move):
+                result = replay_game(self.game, ['e2e4', 'e7e5', bad_move, 'g1f3'])
+                self.assertEqual(result, ReplayResult('UNFINISHED', 2, 0, 2))
+                self.assertEqual(self.game.get_position_hash(), _hash_after(['e2e4', 'e7e5']))
+
+    def test_move_after_game_end_is_illegal(self):
+        result = replay_game(self.game, self.moves + [('a7', 'a5'), ('a2', 'a3')])
+        self.assertEqual(result, ReplayResult('WHITE_WON', len(self.moves), _captures(self.moves), len(self.moves)))
+
+    def test_capture_destroying_both_kings_is_not_illegal(self):
+        game = ChessVar()
+        for move in BOTH_KINGS_DESTROYED[:-1]:
+            self.assertTrue(game.make_move(*move))
+        self.assertFalse(game.make_move(*BOTH_KINGS_DESTROYED[-1]))
+        result = replay_game(self.game, BOTH_KINGS_DESTROYED)
+        self.assertEqual(result, ReplayResult('UNFINISHED', None, _captures(BOTH_KINGS_DESTROYED),
+                                              len(BOTH_KINGS_DESTROYED)))
+        self.assertEqual(self.game.get_position(), game.get_position())
+
+
+class ReplayGamesTest(unittest.TestCase):
+    """replay_games in this process and in worker processes"""
+
+    def test_workers_give_in_process_results(self):
+        games = [game.moves for game in generate_games(40, seed=7)]
+        games += [BOTH_KINGS_DESTROYED, ['e2e4', 'e2e4'], []]
+        expected = [replay_game(ChessVar(), moves) for moves in games]
+        self.assertEqual(list(replay_games(games)), expected)
+        self.assertEqual(list(replay_games(iter(games), workers=2, chunk_size=3)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# Description: Tests of the request handling of server.py, driven through GameServer.handle_request without opening
+# a socket: the responses to moves, malformed requests and engine replies, including after the engine pool breaks.
+
+import asyncio
+import os
+import signal
+import unittest
+
+from server import GameServer
+
+
+class GameServerTest(unittest.TestCase):
+    """Responses of GameServer.handle_request"""
+
+    def setUp(self):
+        self.server = GameServer(engine_depth=1, engine_workers=1)
+
+    def tearDown(self):
+        if self.server._executor is not None:
+            self.server._executor.shutdown()
+
+    def request(self, line):
+        return asyncio.run(self.server.handle_request(line))
+
+    def test_moves_and_bad_requests(self):
+        self.assertEqual(self.request('NEW'), {'ok': True, 'game': 1, 'state': 'UNFINISHED', 'turn': 'white'})
+        self.assertEqual(self.request('MOVE 1 e2 e4')['diff'], {'e2': None, 'e4': 'P'})
+        self.assertEqual(self.request('MOVE 1 e2 e4')['error'], 'illegal move')
+        for line in ('MOVE 1 e 4', 'MOVE 1 e22 e4', 'MOVE x e7 e5', 'FLY 1'):
+            with self.subTest(line=line):
+                self.assertFalse(self.request(line)['ok'])
+
+    def test_engine_move(self):
+        self.request('NEW')
+        response = self.request('ENGINE 1')
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['turn'], 'black')
+
+    @unittest.skipUnless(hasattr(signal, 'SIGKILL'), 'needs SIGKILL')
+    def test_engine_pool_is_replaced_when_a_worker_dies(self):
+        self.request('NEW')
+        self.assertTrue(self.request('ENGINE 1')['ok'])
+        executor = self.server._executor
+        for pid in list(executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        self.assertEqual(self.request('ENGINE 1'), {'ok': False, 'game': 1, 'error': 'engine unavailable'})
+        self.assertIsNone(self.server._executor)
+        self.assertTrue(self.request('ENGINE 1')['ok'])
+        self.assertIsNot(self.server._executor, executor)
+
+
+if __name__ == '__main__':
+    unittest.main()